@@ -2,6 +2,7 @@ import sentry_sdk
 from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
 from config import Config
 
 # Inicializa Sentry ANTES de criar o app Flask
@@ -11,7 +12,10 @@ sentry_sdk.init(
     traces_sample_rate=1.0,
 )
 
-db = SQLAlchemy()
+from app.db_routing import RoutingSession
+
+# Leituras de requests GET vão para o pool somente leitura (app/db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app(config_class=Config):
     app = Flask(__name__)
@@ -20,7 +24,9 @@ def create_app(config_class=Config):
     # Habilitar CORS para Flutter
     CORS(app, resources={r"/*": {"origins": "*"}})
 
-    # Inicializar banco
+    # Inicializar banco (pool pequeno de escrita quando as leituras têm pool próprio)
+    from app.db_routing import configure_writer_pool
+    configure_writer_pool(app)
     db.init_app(app)
 
     # Registrar rotas principais
@@ -31,9 +37,72 @@ def create_app(config_class=Config):
     from app.auth import auth_bp
     app.register_blueprint(auth_bp)
 
+    from app.auth.cache import principal_cache
+    principal_cache.configure(
+        app.config.get('PRINCIPAL_CACHE_SIZE', 1024),
+        app.config.get('PRINCIPAL_CACHE_TTL', 300)
+    )
+
+
+    # Escritas passam pelo gate (pausado durante o restore a quente)
+    from app.write_gate import init_write_gate
+    init_write_gate(app)
 
     # Criar tabelas
     with app.app_context():
-        db.create_all()
+        # PRAGMAs do perfil do SQLite (WAL, busy_timeout...) em cada conexão
+        from app.storage import configure_sqlite
+        configure_sqlite(app)
+
+        init_database(app)
+
+        # Pool somente leitura para requests GET (depois das migrações)
+        from app.db_routing import configure_read_engine
+        from app.storage import read_pragmas
+        configure_read_engine(app, db, read_pragmas(app.config))
+
+    # Commit em lote de toggle-date/skip (opcional)
+    from app.group_commit import group_commit
+    group_commit.configure(app)
 
     return app
+
+
+def init_database(app):
+    """
+    Cria as tabelas e aplica as migrações/índices/triggers (idempotente).
+    Roda na inicialização e de novo depois de um restore a quente, já que
+    o backup restaurado pode ser de um schema anterior.
+    """
+    db.create_all()
+
+    # create_all não cria índices novos em tabelas que já existem
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_task_user_completed ON tasks (user_id, completed_at)"
+    ))
+    db.session.commit()
+
+    # Fuso horário por usuário (bancos antigos)
+    from app.rollover import init_user_timezones
+    init_user_timezones()
+
+    # Fotos de perfil em disco, endereçadas por hash
+    from app.photos import configure_photo_storage, init_user_photos
+    configure_photo_storage(app)
+    init_user_photos()
+
+    # Índice de busca textual (FTS5) das tarefas
+    from app.search import init_search_index
+    init_search_index()
+
+    # Rollup de minutos por nível de energia (dashboard)
+    from app.rollup import init_energy_rollup
+    init_energy_rollup()
+
+    # Ledger de minutos ocupados por dia (timebox)
+    from app.capacity import init_capacity_ledger
+    init_capacity_ledger()
+
+    # Log de alterações para /sync (triggers)
+    from app.sync import init_change_log
+    init_change_log()
@@ -2,7 +2,8 @@
 Auth Package - Autenticação JWT para Tríade
 
 Organização:
-- decorators: token_required, token_optional
+- decorators: token_required, token_optional, admin_required, AuthPrincipal
+- cache: principal_cache (LRU/TTL do usuário autenticado)
 - helpers: generate_tokens, decode_token
 - routes: login, register, refresh
 - user_routes: perfil, foto, senha
@@ -14,7 +15,7 @@ from flask import Blueprint
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 # Importar decorators para exposição no pacote
-from app.auth.decorators import token_required, token_optional
+from app.auth.decorators import token_required, token_optional, admin_required, AuthPrincipal
 
 # Importar rotas para registro
 from app.auth import routes
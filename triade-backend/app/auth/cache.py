@@ -0,0 +1,115 @@
+"""
+Principal Cache - Cache em memória do usuário autenticado
+
+LRU limitado com TTL, por user_id, para que token_required/token_optional
+não precisem ir ao banco a cada request. Qualquer UPDATE/DELETE de User
+via ORM (perfil, senha, foto, exclusão) invalida a entrada quando a
+transação é confirmada. O cache é por processo: com vários workers, o TTL
+limita por quanto tempo outro worker pode ver dados antigos.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.models import User
+
+_DIRTY_KEY = 'principal_cache_dirty'
+
+
+class PrincipalCache:
+    """LRU + TTL thread-safe de AuthPrincipal por user_id, com contadores"""
+
+    def __init__(self, max_size=1024, ttl_seconds=300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # user_id -> (principal, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def configure(self, max_size, ttl_seconds):
+        with self._lock:
+            self.max_size = max_size
+            self.ttl_seconds = ttl_seconds
+            self._entries.clear()
+
+    def get(self, user_id):
+        """AuthPrincipal em cache ou None (expirado conta como miss)"""
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id, principal):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (principal, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+# ==================== INVALIDAÇÃO ====================
+
+def _mark_dirty(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(target.id)
+
+
+event.listen(User, 'after_update', _mark_dirty)
+event.listen(User, 'after_delete', _mark_dirty)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop(_DIRTY_KEY, ()):
+        principal_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_after_rollback(session, previous_transaction):
+    if not session.in_transaction():
+        session.info.pop(_DIRTY_KEY, None)
@@ -4,11 +4,46 @@ Auth Decorators e Helpers
 Funções auxiliares para autenticação JWT.
 """
 
+from collections import namedtuple
 from flask import request, jsonify, current_app
 from functools import wraps
+import hmac
 import jwt
 
+from app import db
 from app.models import User
+from app.auth.cache import principal_cache
+
+
+class AuthPrincipal(namedtuple('AuthPrincipal', ('id', 'username', 'personal_name', 'email'))):
+    """
+    Usuário autenticado passado às rotas como current_user.
+    Só colunas pequenas (nunca foto nem hash de senha); rotas que alteram o
+    perfil carregam o User completo com load_user(current_user.id).
+    """
+    __slots__ = ()
+
+
+def load_principal(user_id):
+    """AuthPrincipal do usuário (None se não existir), via principal_cache"""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    row = db.session.query(
+        User.id, User.username, User.personal_name, User.email
+    ).filter(User.id == user_id).first()
+    if not row:
+        return None
+
+    principal = AuthPrincipal(*row)
+    principal_cache.put(user_id, principal)
+    return principal
+
+
+def load_user(user_id):
+    """User ORM completo (para rotas que alteram ou serializam o perfil)"""
+    return db.session.get(User, user_id)
 
 
 def generate_tokens(user):
@@ -84,7 +119,7 @@ def token_required(f):
         if payload.get('type') != 'access':
             return jsonify({'error': 'Tipo de token inválido'}), 401
         
-        user = User.query.get(payload['user_id'])
+        user = load_principal(payload['user_id'])
         if not user:
             return jsonify({'error': 'Usuário não encontrado'}), 401
         
@@ -109,8 +144,28 @@ def token_optional(f):
         if token:
             payload, error = decode_token(token)
             if not error and payload.get('type') == 'access':
-                current_user = User.query.get(payload['user_id'])
+                current_user = load_principal(payload['user_id'])
         
         return f(current_user=current_user, *args, **kwargs)
     
     return decorated
+
+
+def admin_required(f):
+    """
+    Decorador para rotas administrativas: exige o header X-Admin-Token igual
+    a ADMIN_TOKEN da config. Sem ADMIN_TOKEN configurado, as rotas ficam fechadas.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        expected = current_app.config.get('ADMIN_TOKEN')
+        if not expected:
+            return jsonify({'error': 'Rotas administrativas desabilitadas (ADMIN_TOKEN não configurado)'}), 403
+        
+        provided = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(provided.encode(), expected.encode()):
+            return jsonify({'error': 'Token de administrador inválido'}), 401
+        
+        return f(*args, **kwargs)
+    
+    return decorated
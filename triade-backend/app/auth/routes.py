@@ -15,7 +15,7 @@ from flask import request, jsonify
 from app import db
 from app.auth import auth_bp
 from app.auth.decorators import generate_tokens, decode_token
-from app.models import User
+from app.models import User, DEFAULT_TIMEZONE
 
 
 @auth_bp.route('/register', methods=['POST'])
@@ -49,6 +49,11 @@ def register():
     if not valid:
         return jsonify({'error': error, 'field': 'password'}), 400
     
+    timezone = data.get('timezone') or DEFAULT_TIMEZONE
+    valid, error = User.validate_timezone(timezone)
+    if not valid:
+        return jsonify({'error': error, 'field': 'timezone'}), 400
+    
     # Verificar duplicatas
     if User.query.filter_by(username=username).first():
         return jsonify({'error': 'Username já está em uso', 'field': 'username'}), 409
@@ -60,7 +65,8 @@ def register():
     user = User(
         username=username,
         personal_name=personal_name,
-        email=email
+        email=email,
+        timezone=timezone
     )
     user.set_password(password)
     
@@ -5,27 +5,62 @@ Endpoints:
 - GET /auth/me - Dados do usuário atual
 - PUT /auth/me - Atualizar perfil
 - POST /auth/me/photo - Upload de foto
-- GET /auth/me/photo - Obter foto
+- GET /auth/me/photo?size=small|medium|original - Obter foto
 - DELETE /auth/me/photo - Remover foto
-- GET /auth/users/<username>/photo - Foto pública de usuário
+- GET /auth/users/<username>/photo?size= - Foto pública de usuário
+
+As fotos são servidas com ETag (hash do conteúdo + variante) e aceitam
+If-None-Match (304) e Range.
 - PUT /auth/change-password - Alterar senha
 """
 
 from flask import request, jsonify, send_file
 import base64
-from io import BytesIO
 
 from app import db
 from app.auth import auth_bp
-from app.auth.decorators import token_required
+from app.auth.decorators import token_required, load_user
 from app.models import User, get_brazil_time
+from app.photos import (
+    PHOTO_VARIANTS, get_photo, save_photo, remove_photo, photo_path, discard_blob_if_unused
+)
+
+
+def _send_photo(user_id, private):
+    """Resposta condicional (ETag/304, Range) com a variante pedida em ?size="""
+    variant = request.args.get('size', 'original')
+    if variant not in PHOTO_VARIANTS:
+        return jsonify({'error': f"size deve ser um de: {', '.join(PHOTO_VARIANTS)}"}), 400
+    
+    photo = get_photo(user_id)
+    if not photo:
+        return jsonify({'error': 'Usuário não possui foto de perfil'}), 404
+    
+    content_hash, mimetype, _ = photo
+    # O ETag é da variante realmente enviada: enquanto a miniatura não fica
+    # pronta, a original sai com o ETag da original e o cliente não fica
+    # preso a ela (304) depois que a miniatura existir
+    path, served_variant = photo_path(content_hash, variant)
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        etag=f'{content_hash}-{served_variant}',
+        conditional=True
+    )
+    # Sempre revalida: a URL é fixa, mas o ETag só muda quando a foto muda
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    return response
 
 
 @auth_bp.route('/me', methods=['GET'])
 @token_required
 def get_current_user(current_user):
     """Retorna dados do usuário autenticado"""
-    return jsonify({'user': current_user.to_dict()}), 200
+    return jsonify({'user': load_user(current_user.id).to_dict()}), 200
 
 
 @auth_bp.route('/me', methods=['PUT'])
@@ -33,6 +68,7 @@ def get_current_user(current_user):
 def update_profile(current_user):
     """Atualiza dados do perfil do usuário"""
     data = request.get_json()
+    user = load_user(current_user.id)
     
     if not data:
         return jsonify({'error': 'Dados não fornecidos'}), 400
@@ -43,7 +79,7 @@ def update_profile(current_user):
             return jsonify({'error': 'Nome pessoal deve ter no máximo 30 caracteres'}), 400
         if len(personal_name) < 1:
             return jsonify({'error': 'Nome pessoal é obrigatório'}), 400
-        current_user.personal_name = personal_name
+        user.personal_name = personal_name
     
     if 'email' in data:
         email = data['email'].lower().strip()
@@ -59,14 +95,20 @@ def update_profile(current_user):
         if existing:
             return jsonify({'error': 'Email já está em uso', 'field': 'email'}), 409
         
-        current_user.email = email
+        user.email = email
     
-    current_user.updated_at = get_brazil_time()
+    if 'timezone' in data:
+        valid, error = User.validate_timezone(data['timezone'])
+        if not valid:
+            return jsonify({'error': error, 'field': 'timezone'}), 400
+        user.timezone = data['timezone']
+    
+    user.updated_at = get_brazil_time()
     db.session.commit()
     
     return jsonify({
         'message': 'Perfil atualizado com sucesso',
-        'user': current_user.to_dict()
+        'user': user.to_dict()
     }), 200
 
 
@@ -94,9 +136,6 @@ def upload_photo(current_user):
             if len(photo_bytes) > 2 * 1024 * 1024:
                 return jsonify({'error': 'Foto deve ter no máximo 2MB'}), 400
             
-            current_user.profile_photo = photo_bytes
-            current_user.profile_photo_mimetype = mimetype
-            
         except Exception as e:
             return jsonify({'error': f'Erro ao processar foto: {str(e)}'}), 400
     else:
@@ -116,11 +155,11 @@ def upload_photo(current_user):
         if len(photo_bytes) > 2 * 1024 * 1024:
             return jsonify({'error': 'Foto deve ter no máximo 2MB'}), 400
         
-        current_user.profile_photo = photo_bytes
-        current_user.profile_photo_mimetype = file.content_type
+        mimetype = file.content_type
     
-    current_user.updated_at = get_brazil_time()
+    previous_hash = save_photo(load_user(current_user.id), photo_bytes, mimetype)
     db.session.commit()
+    discard_blob_if_unused(previous_hash)
     
     return jsonify({'message': 'Foto atualizada com sucesso'}), 200
 
@@ -129,23 +168,16 @@ def upload_photo(current_user):
 @token_required
 def get_my_photo(current_user):
     """Retorna foto de perfil do usuário autenticado"""
-    if not current_user.profile_photo:
-        return jsonify({'error': 'Usuário não possui foto de perfil'}), 404
-    
-    return send_file(
-        BytesIO(current_user.profile_photo),
-        mimetype=current_user.profile_photo_mimetype or 'image/jpeg'
-    )
+    return _send_photo(current_user.id, private=True)
 
 
 @auth_bp.route('/me/photo', methods=['DELETE'])
 @token_required
 def delete_photo(current_user):
     """Remove foto de perfil"""
-    current_user.profile_photo = None
-    current_user.profile_photo_mimetype = None
-    current_user.updated_at = get_brazil_time()
+    previous_hash = remove_photo(load_user(current_user.id))
     db.session.commit()
+    discard_blob_if_unused(previous_hash)
     
     return jsonify({'message': 'Foto removida com sucesso'}), 200
 
@@ -153,18 +185,12 @@ def delete_photo(current_user):
 @auth_bp.route('/users/<username>/photo', methods=['GET'])
 def get_user_photo(username):
     """Retorna foto de perfil de um usuário público"""
-    user = User.query.filter_by(username=username.lower()).first()
+    user_id = db.session.query(User.id).filter_by(username=username.lower()).scalar()
     
-    if not user:
+    if not user_id:
         return jsonify({'error': 'Usuário não encontrado'}), 404
     
-    if not user.profile_photo:
-        return jsonify({'error': 'Usuário não possui foto de perfil'}), 404
-    
-    return send_file(
-        BytesIO(user.profile_photo),
-        mimetype=user.profile_photo_mimetype or 'image/jpeg'
-    )
+    return _send_photo(user_id, private=False)
 
 
 @auth_bp.route('/change-password', methods=['PUT'])
@@ -182,15 +208,16 @@ def change_password(current_user):
     if not current_password or not new_password:
         return jsonify({'error': 'Senha atual e nova senha são obrigatórias'}), 400
     
-    if not current_user.check_password(current_password):
+    user = load_user(current_user.id)
+    if not user.check_password(current_password):
         return jsonify({'error': 'Senha atual incorreta'}), 401
     
     valid, error = User.validate_password(new_password)
     if not valid:
         return jsonify({'error': error}), 400
     
-    current_user.set_password(new_password)
-    current_user.updated_at = get_brazil_time()
+    user.set_password(new_password)
+    user.updated_at = get_brazil_time()
     db.session.commit()
     
     return jsonify({'message': 'Senha alterada com sucesso'}), 200
@@ -1,17 +1,146 @@
 # app/backup.py
+import hashlib
 import os
-import shutil
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from app import db
+from flask import current_app
+from app import db, init_database
+from app.auth.cache import principal_cache
+from app.models import JobRun
+from app.job_runs import record_job_run, create_job_run
+from app.db_routing import dispose_read_engine
+from app.write_gate import write_gate, WriteGateClosed, DEFAULT_WAIT_SECONDS
+from app.snapshots import (
+    create_snapshot, apply_retention, list_snapshots, materialize_snapshot, load_manifest, iter_snapshot_range,
+    storage_usage, SnapshotNotFound, DEFAULT_BLOCK_PAGES
+)
 
-def backup_database():
+# Backups rodam um por vez, fora da thread do request
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='backup')
+
+# Progresso dos backups em andamento neste processo: run_id -> dict
+# (não é gravado no banco durante a cópia: escrever no banco de origem
+# reiniciaria o backup online)
+_progress = {}
+_progress_lock = threading.Lock()
+
+
+# Download/upload em pedaços: um backup nunca é carregado inteiro na memória
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+SQLITE_HEADER = b'SQLite format 3\x00'
+UPLOAD_NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$')
+
+# SHA-256 dos arquivos .db: (caminho, tamanho, mtime) -> hash
+_checksums = {}
+
+
+class BackupRestartLimit(Exception):
+    """O banco mudou vezes demais durante a cópia em passos"""
+
+
+class InvalidBackupUpload(ValueError):
+    """Arquivo enviado não é um banco SQLite íntegro (ou o checksum não confere)"""
+
+
+class BackupUploadTooLarge(ValueError):
+    """Upload maior que BACKUP_MAX_UPLOAD_MB"""
+
+
+def _database_path():
+    """Caminho do arquivo SQLite em uso pelo app"""
+    url = db.engine.url
+    if url.get_backend_name() != 'sqlite' or not url.database or url.database == ':memory:':
+        raise RuntimeError('Backup online disponível apenas para banco SQLite em arquivo')
+    return Path(url.database)
+
+
+def _backup_into(source_path, target, pages_per_step, step_sleep_ms, max_restarts, on_progress=None):
+    """
+    Copia source -> conexão target pela API de backup online do SQLite, em
+    passos de pages_per_step páginas, dormindo step_sleep_ms entre passos
+    para deixar os escritores trabalharem. Cada escrita de outra conexão
+    reinicia a cópia; depois de max_restarts reinícios, copia em um passo só.
+    Retorna {pages, page_size, steps, restarts}.
+    """
+    stats = {'steps': 0, 'restarts': 0}
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal last_remaining
+        stats['steps'] += 1
+        if last_remaining is not None and remaining > last_remaining:
+            stats['restarts'] += 1
+            if stats['restarts'] > max_restarts:
+                raise BackupRestartLimit()
+        last_remaining = remaining
+        if on_progress:
+            on_progress(total - remaining, total)
+        if step_sleep_ms and remaining:
+            time.sleep(step_sleep_ms / 1000)
+
+    source = sqlite3.connect(str(source_path))
+    try:
+        try:
+            source.backup(target, pages=pages_per_step, progress=progress)
+        except BackupRestartLimit:
+            source.backup(target, pages=-1)
+        stats['page_size'] = source.execute('PRAGMA page_size').fetchone()[0]
+        stats['pages'] = source.execute('PRAGMA page_count').fetchone()[0]
+    finally:
+        source.close()
+    return stats
+
+
+def _online_backup(source_path, target_path, pages_per_step, step_sleep_ms, max_restarts, on_progress=None):
+    """Backup online de source para o arquivo target_path. Retorna as stats de _backup_into + bytes"""
+    target = sqlite3.connect(str(target_path))
+    try:
+        stats = _backup_into(source_path, target, pages_per_step, step_sleep_ms, max_restarts, on_progress)
+    finally:
+        target.close()
+
+    stats['bytes'] = target_path.stat().st_size
+    return stats
+
+
+def _online_backup_to_memory(source_path, pages_per_step, step_sleep_ms, max_restarts, on_progress=None):
+    """
+    Backup online de source para um banco em memória. Retorna (stats, conteúdo
+    serializado): as páginas vão direto para os blocos do snapshot, sem
+    cópia intermediária em disco.
     """
-    Cria backup do banco de dados SQLite.
-    Retorna o caminho do arquivo de backup criado.
+    target = sqlite3.connect(':memory:')
+    try:
+        stats = _backup_into(source_path, target, pages_per_step, step_sleep_ms, max_restarts, on_progress)
+        data = target.serialize()
+    finally:
+        target.close()
+
+    stats['bytes'] = len(data)
+    return stats, data
+
+
+def _set_progress(run_id, **values):
+    if run_id is None:
+        return
+    with _progress_lock:
+        _progress.setdefault(run_id, {}).update(values)
+
+
+def backup_database(run_id=None):
+    """
+    Cria um snapshot incremental do banco de dados SQLite: cópia consistente
+    pela API de backup online, quebrada em blocos comprimidos e deduplicados
+    (ver app/snapshots.py). A cópia é feita em memória; só bancos maiores
+    que BACKUP_IN_MEMORY_MAX_MB passam por um arquivo temporário. Retorna o
+    id do snapshot.
     """
-    # Caminho do banco original
-    db_path = Path('instance/triade.db')
+    db_path = _database_path()
     
     # Verificar se o banco existe
     if not db_path.exists():
@@ -21,104 +150,387 @@ def backup_database():
     backup_dir = Path('backups')
     backup_dir.mkdir(exist_ok=True)
     
-    # Nome do arquivo com timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_filename = f'triade_{timestamp}.db'
-    backup_path = backup_dir / backup_filename
+    snapshot_id = datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
+    partial_path = backup_dir / f'.snapshot_{snapshot_id}.partial'
     
-    # Copiar arquivo
-    shutil.copy2(db_path, backup_path)
-    
-    # Limpar backups antigos (manter apenas os 10 mais recentes)
-    _cleanup_old_backups(backup_dir, keep=10)
-    
-    return str(backup_path)
-
-def _cleanup_old_backups(backup_dir, keep=10):
-    """Remove backups antigos, mantendo apenas os N mais recentes"""
-    backup_files = sorted(
-        backup_dir.glob('triade_*.db'),
-        key=lambda x: x.stat().st_mtime,
-        reverse=True
-    )
+    config = current_app.config
+    copy_options = {
+        'pages_per_step': config.get('BACKUP_PAGES_PER_STEP', 256),
+        'step_sleep_ms': config.get('BACKUP_STEP_SLEEP_MS', 5),
+        'max_restarts': config.get('BACKUP_MAX_RESTARTS', 5),
+        'on_progress': lambda done, total: _set_progress(run_id, pages_done=done, pages_total=total)
+    }
+    in_memory = db_path.stat().st_size <= config.get('BACKUP_IN_MEMORY_MAX_MB', 512) * 1024 * 1024
+
+    with record_job_run('backup', run_id=run_id, snapshot_id=snapshot_id) as run:
+        try:
+            # Cópia online em passos, em memória (ou num arquivo temporário, se o banco for grande)
+            started = time.perf_counter()
+            if in_memory:
+                stats, source = _online_backup_to_memory(db_path, **copy_options)
+            else:
+                stats = _online_backup(db_path, partial_path, **copy_options)
+                source = partial_path
+            seconds = time.perf_counter() - started
+            run.add_phase(
+                'copy',
+                rows=0,
+                duration_ms=round(seconds * 1000, 2),
+                throughput_mb_s=round(stats['bytes'] / (1024 * 1024) / seconds, 2) if seconds else None,
+                in_memory=in_memory,
+                **stats
+            )
+            
+            # Só os blocos que mudaram desde o último snapshot são gravados
+            started = time.perf_counter()
+            manifest = create_snapshot(
+                source,
+                stats['page_size'],
+                block_pages=config.get('BACKUP_BLOCK_PAGES', DEFAULT_BLOCK_PAGES),
+                snapshot_id=snapshot_id
+            )
+            run.add_phase(
+                'snapshot',
+                rows=manifest['new_blocks'],
+                duration_ms=round((time.perf_counter() - started) * 1000, 2),
+                snapshot_id=snapshot_id,
+                compression=manifest['compression'],
+                size_bytes=manifest['size_bytes'],
+                blocks=len(manifest['blocks']),
+                new_blocks=manifest['new_blocks'],
+                new_bytes=manifest['new_bytes']
+            )
+        finally:
+            source = None  # libera a cópia em memória antes da retenção
+            partial_path.unlink(missing_ok=True)
+        
+        # Retenção em camadas (últimos/hora/dia/semana, inclusive os backups
+        # completos antigos) + coleta de blocos órfãos
+        started = time.perf_counter()
+        retention = apply_retention(
+            config.get('BACKUP_KEEP_LAST', 3),
+            config.get('BACKUP_KEEP_HOURLY', 24),
+            config.get('BACKUP_KEEP_DAILY', 7),
+            config.get('BACKUP_KEEP_WEEKLY', 4)
+        )
+        run.add_phase(
+            'retention',
+            rows=retention['removed_snapshots'],
+            duration_ms=round((time.perf_counter() - started) * 1000, 2),
+            **retention
+        )
     
-    # Remover arquivos além do limite
-    for old_backup in backup_files[keep:]:
-        old_backup.unlink()
+    return snapshot_id
+
+
+def start_backup_job():
+    """Enfileira um backup no worker de background e retorna o id do job (job_runs.id)"""
+    app = current_app._get_current_object()
+    run_id = create_job_run('backup')
+    _set_progress(run_id, pages_done=0, pages_total=None)
 
+    def run():
+        with app.app_context():
+            try:
+                backup_database(run_id)
+            except Exception as e:
+                print(f"[BACKUP] Erro no backup {run_id}: {e}")
+            finally:
+                with _progress_lock:
+                    _progress.pop(run_id, None)
 
+    _executor.submit(run)
+    return run_id
+
+
+def get_backup_job(run_id):
+    """Status do job de backup (None se não existir)"""
+    run = db.session.get(JobRun, run_id)
+    if run is None or run.job != 'backup':
+        return None
+
+    data = run.to_dict()
+    phases = {phase['name']: phase for phase in data['phases']}
+    copy_phase = phases.get('copy') or {}
+    snapshot_phase = phases.get('snapshot') or {}
+    data['snapshot_id'] = snapshot_phase.get('snapshot_id')
+    data['size_bytes'] = copy_phase.get('bytes')
+    data['written_bytes'] = snapshot_phase.get('new_bytes')
+    data['throughput_mb_s'] = copy_phase.get('throughput_mb_s')
+    with _progress_lock:
+        data['progress'] = dict(_progress[run_id]) if run_id in _progress else None
+    return data
+
+def _integrity_check(connection):
+    """Resultado do PRAGMA integrity_check ('ok' se o banco está íntegro)"""
+    rows = connection.execute('PRAGMA integrity_check').fetchall()
+    return '; '.join(row[0] for row in rows)
+
+
+def _copy_into(source_path, target_connection):
+    """Copia source inteiro para a conexão de destino (um passo, com lock de escrita)"""
+    source = sqlite3.connect(str(source_path))
+    try:
+        source.backup(target_connection, pages=-1)
+    finally:
+        source.close()
 
 
 def restore_backup(backup_filename):
     """
-    Restaura um backup específico.
-    Tenta fechar conexões antes de sobrescrever.
+    Restaura um backup específico com o servidor no ar (sem reinício):
+
+    1. Reconstrói o arquivo do backup e roda o integrity_check nele
+    2. Fecha o write gate e espera as escritas em andamento terminarem
+    3. Faz a cópia de segurança do banco atual (pre_restore_*.db)
+    4. Copia o backup para dentro do banco em uso pela API de backup do
+       SQLite (conexões abertas, inclusive de outros workers, passam a ver
+       o conteúdo novo; as escritas deles esperam o lock)
+    5. integrity_check no banco em uso (se falhar, volta a cópia de
+       segurança), migrações do schema e reabre o gate
     """
     # Caminho base do projeto (ajuste se necessário, mas geralmente o root é o cwd)
     base_path = Path.cwd()
 
+    backup_filename = Path(backup_filename).name
     backup_path = base_path / 'backups' / backup_filename
 
-    # CORREÇÃO 1: O banco geralmente fica dentro de 'instance' no Flask moderno
-    # Se o seu estiver na raiz, mude para base_path / 'triade.db'
-    current_db = base_path / 'instance' / 'triade.db' 
+    # Snapshot incremental: reconstrói o arquivo (blocos do manifest) antes de restaurar
+    if not backup_path.exists() and not backup_filename.endswith('.db'):
+        try:
+            load_manifest(backup_filename)
+        except SnapshotNotFound:
+            raise FileNotFoundError(f'Backup {backup_filename} não encontrado')
+        backup_path = base_path / 'backups' / f'.restore_{backup_filename}.db'
+        materialize_snapshot(backup_filename, backup_path)
 
     if not backup_path.exists():
         raise FileNotFoundError(f'Backup {backup_filename} não encontrado')
 
-    # --- O TRUQUE PARA O WINDOWS ---
-    # 1. Remove a sessão atual (rollback em transações pendentes)
-    db.session.remove()
-    # 2. Descarta o pool de conexões. Isso deve liberar o arquivo no SO.
-    db.engine.dispose()
-    # -------------------------------
-
-    # Fazer backup de segurança do banco atual (Emergency Backup)
-    emergency_backup_name = None
-    if current_db.exists():
-        emergency_backup_name = f'pre_restore_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
-        emergency_backup_path = base_path / 'backups' / emergency_backup_name
+    current_db = _database_path()
+    app = current_app._get_current_object()
 
+    try:
+        # Verifica o backup antes de pausar qualquer escrita (immutable: cópia
+        # privada, sem criar -wal/-shm ao lado quando o backup está em WAL)
+        check = sqlite3.connect(f'file:{backup_path}?mode=ro&immutable=1', uri=True)
         try:
-            shutil.copy2(current_db, emergency_backup_path)
-        except PermissionError:
-            # Se ainda der erro aqui, é porque algo externo (DB Browser, VS Code) está segurando o arquivo
+            integrity = _integrity_check(check)
+        finally:
+            check.close()
+        if integrity != 'ok':
             return {
-                'error': 'O arquivo do banco está travado. Feche visualizadores de DB ou reinicie o servidor.',
+                'error': f'Backup {backup_filename} falhou no integrity_check: {integrity}',
                 'success': False
             }
 
-    # Restaurar (sobrescreve o triade.db atual)
-    try:
-        shutil.copy2(backup_path, current_db)
-    except OSError as e:
-        return {
-            'error': f'Falha ao sobrescrever o arquivo: {str(e)}. O Windows bloqueou o arquivo.',
-            'success': False
-        }
+        emergency_backup_name = f'pre_restore_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
+        emergency_backup_path = base_path / 'backups' / emergency_backup_name
+
+        # Transações desta thread não podem segurar o banco durante a cópia
+        db.session.remove()
+
+        with write_gate.pause(app.config.get('WRITE_GATE_WAIT_SECONDS', DEFAULT_WAIT_SECONDS)) as drain_ms:
+            paused_at = time.perf_counter()
 
+            _online_backup(current_db, emergency_backup_path,
+                           pages_per_step=-1, step_sleep_ms=0, max_restarts=0)
+
+            live = sqlite3.connect(str(current_db))
+            try:
+                _copy_into(backup_path, live)
+                integrity = _integrity_check(live)
+                if integrity != 'ok':
+                    _copy_into(emergency_backup_path, live)
+                    raise RuntimeError(f'Banco restaurado falhou no integrity_check ({integrity}); estado anterior mantido')
+            finally:
+                live.close()
+
+            # Conexões do pool podem ter cache de schema/páginas antigo
+            db.engine.dispose()
+            dispose_read_engine(app)
+            init_database(app)
+            principal_cache.clear()
+
+            write_pause_ms = round((time.perf_counter() - paused_at) * 1000, 2)
+    except WriteGateClosed as e:
+        return {'error': str(e), 'success': False}
+    finally:
+        db.session.remove()
+        if backup_path.name.startswith('.restore_'):
+            backup_path.unlink(missing_ok=True)
+
+    print(f"[BACKUP] Banco restaurado de {backup_filename} (escritas pausadas por {write_pause_ms}ms)")
     return {
         'restored_backup': backup_filename,
         'safety_backup': emergency_backup_name,
         'message': f'Banco restaurado de {backup_filename}',
-        'warning': 'Recomendado reiniciar o servidor para garantir integridade total.',
+        'integrity_check': 'ok',
+        'drain_ms': drain_ms,
+        'write_pause_ms': round(drain_ms + write_pause_ms, 2),
         'success': True
     }
 
-def list_backups():
-    """Lista todos os backups disponíveis"""
+def _checksum_key(path):
+    stat = path.stat()
+    return (str(path), stat.st_size, stat.st_mtime_ns)
+
+
+def _file_sha256(path, compute=True):
+    """SHA-256 do arquivo, lido em pedaços (com cache enquanto o arquivo não muda)"""
+    key = _checksum_key(path)
+    if key not in _checksums and compute:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as source:
+            while chunk := source.read(TRANSFER_CHUNK_SIZE):
+                digest.update(chunk)
+        _checksums[key] = digest.hexdigest()
+    return _checksums.get(key)
+
+
+def open_backup_download(name):
+    """
+    Localiza um backup para download: arquivo .db em backups/ ou snapshot
+    (que é remontado bloco a bloco durante o envio). Retorna
+    {filename, size, sha256, path | snapshot_id}.
+    """
+    name = Path(name).name
+    path = Path('backups') / name
+    if name.endswith('.db') and not name.startswith('.') and path.is_file():
+        return {
+            'filename': name,
+            'size': path.stat().st_size,
+            'sha256': _file_sha256(path),
+            'path': path
+        }
+
+    try:
+        manifest = load_manifest(name)
+    except SnapshotNotFound:
+        raise FileNotFoundError(f'Backup {name} não encontrado')
+    return {
+        'filename': f'{name}.db',
+        'size': manifest['size_bytes'],
+        'sha256': manifest['sha256'],
+        'snapshot_id': name
+    }
+
+
+def iter_backup_bytes(download, start, stop):
+    """Bytes [start, stop) do backup, em pedaços de até TRANSFER_CHUNK_SIZE"""
+    if 'snapshot_id' in download:
+        yield from iter_snapshot_range(download['snapshot_id'], start, stop)
+        return
+
+    with open(download['path'], 'rb') as source:
+        source.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = source.read(min(TRANSFER_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def receive_backup_upload(name, stream, expected_sha256=None):
+    """
+    Grava um banco enviado (stream do request) em backups/<name>.db, em
+    pedaços, para ser usado depois no /backup/restore. O arquivo só
+    aparece com o nome final depois de conferir tamanho, checksum
+    (se enviado), cabeçalho SQLite e integrity_check.
+    """
+    stem = Path(name).name.removesuffix('.db')
+    if not UPLOAD_NAME_PATTERN.match(stem):
+        raise InvalidBackupUpload('Nome inválido (use letras, números, ".", "_" e "-")')
+
     backup_dir = Path('backups')
-    
-    if not backup_dir.exists():
-        return []
-    
+    backup_dir.mkdir(exist_ok=True)
+    target_path = backup_dir / f'{stem}.db'
+    if target_path.exists():
+        raise FileExistsError(f'Backup {target_path.name} já existe')
+
+    max_bytes = current_app.config.get('BACKUP_MAX_UPLOAD_MB', 2048) * 1024 * 1024
+    partial_path = backup_dir / f'.upload_{stem}.partial'
+    digest = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(partial_path, 'wb') as target:
+            while chunk := stream.read(TRANSFER_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise BackupUploadTooLarge(f'Backup maior que {max_bytes // (1024 * 1024)} MB')
+                digest.update(chunk)
+                target.write(chunk)
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 and expected_sha256.strip().lower() != sha256:
+            raise InvalidBackupUpload(f'Checksum não confere (recebido {sha256})')
+
+        with open(partial_path, 'rb') as source:
+            if source.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+                raise InvalidBackupUpload('O arquivo enviado não é um banco SQLite')
+
+        check = sqlite3.connect(f'file:{partial_path}?mode=ro&immutable=1', uri=True)
+        try:
+            integrity = _integrity_check(check)
+        except sqlite3.DatabaseError as e:
+            integrity = str(e)
+        finally:
+            check.close()
+        if integrity != 'ok':
+            raise InvalidBackupUpload(f'Backup falhou no integrity_check: {integrity}')
+
+        os.replace(partial_path, target_path)
+    finally:
+        partial_path.unlink(missing_ok=True)
+
+    # O hash calculado durante o upload vale para o arquivo final
+    _checksums[_checksum_key(target_path)] = sha256
+    return {'filename': target_path.name, 'size_bytes': size, 'sha256': sha256}
+
+
+def _backup_file_type(name):
+    if name.startswith('triade_'):
+        return 'full'
+    if name.startswith('pre_restore_'):
+        return 'safety'
+    return 'upload'
+
+
+def list_backups():
+    """
+    Lista os snapshots incrementais e os arquivos .db em backups/ (completos
+    antigos, cópias de segurança do restore e uploads), com o SHA-256 quando
+    já conhecido e a URL de download
+    """
     backups = []
-    for backup_file in sorted(backup_dir.glob('triade_*.db'), reverse=True):
-        stat = backup_file.stat()
+    for manifest in list_snapshots():
         backups.append({
-            'filename': backup_file.name,
-            'size_mb': round(stat.st_size / (1024 * 1024), 2),
-            'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat()
+            'filename': manifest['id'],
+            'type': 'snapshot',
+            'size_mb': round(manifest['size_bytes'] / (1024 * 1024), 2),
+            'written_mb': round(manifest['new_bytes'] / (1024 * 1024), 2),
+            'compression': manifest['compression'],
+            'sha256': manifest['sha256'],
+            'download_url': f"/backup/{manifest['id']}/download",
+            'created_at': manifest['created_at']
         })
     
-    return backups
\ No newline at end of file
+    backup_dir = Path('backups')
+    if backup_dir.exists():
+        backup_files = [path for path in backup_dir.glob('*.db') if not path.name.startswith('.')]
+        for backup_file in sorted(backup_files, key=lambda path: path.stat().st_mtime, reverse=True):
+            stat = backup_file.stat()
+            backups.append({
+                'filename': backup_file.name,
+                'type': _backup_file_type(backup_file.name),
+                'size_mb': round(stat.st_size / (1024 * 1024), 2),
+                # Não lê o arquivo inteiro só para listar: o hash sai no download
+                'sha256': _file_sha256(backup_file, compute=False),
+                'download_url': f'/backup/{backup_file.name}/download',
+                'created_at': datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+    
+    return backups
@@ -0,0 +1,237 @@
+"""
+Capacity - Horas disponíveis por dia
+
+Carrega as DailyConfig de um usuário para um intervalo inteiro em uma única
+query (índice idx_daily_config_user) e preenche os dias sem configuração
+com o padrão de 8h. Usado pela visão diária, semanal, intervalo e pela
+validação de timebox.
+
+Também mantém o ledger de minutos ocupados por dia (capacity_ledger e
+capacity_projections), atualizado nas mesmas transações que criam, editam
+ou excluem tarefas, para que a validação de timebox seja uma consulta
+indexada em vez de carregar as tarefas do dia.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from sqlalchemy import select, func, cast, type_coerce, literal, and_, or_, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import DailyConfig, Task, TaskStatus, CapacityLedger, CapacityProjection
+
+DEFAULT_AVAILABLE_HOURS = 8.0
+
+
+def get_capacity_map(user_id, start_date, end_date=None):
+    """Retorna {date: available_hours} para cada dia em [start_date, end_date]"""
+    end_date = end_date or start_date
+
+    query = db.session.query(DailyConfig.date, DailyConfig.available_hours).filter(
+        DailyConfig.date >= start_date,
+        DailyConfig.date <= end_date
+    )
+    if user_id:
+        query = query.filter(DailyConfig.user_id == user_id)
+
+    configured = dict(query.all())
+
+    capacity = {}
+    current_date = start_date
+    while current_date <= end_date:
+        capacity[current_date] = configured.get(current_date, DEFAULT_AVAILABLE_HOURS)
+        current_date += timedelta(days=1)
+    return capacity
+
+
+# ==================== LEDGER DE MINUTOS OCUPADOS ====================
+#
+# Minutos ocupados em um dia (mesma regra do resumo da visão diária):
+# - tarefas reais agendadas no dia, não delegadas (qualquer status)
+# - ocorrências projetadas de repetíveis ACTIVE não delegadas, iniciadas
+#   antes do dia e dentro de repeat_days
+#
+# As tarefas reais ficam em capacity_ledger (uma linha por dia). Cada
+# repetível vira duas variações em capacity_projections: +minutos no dia
+# seguinte ao início e -minutos ao fim da janela (se houver). Assim a
+# consulta de um dia é uma busca pela chave + soma das variações até ele.
+
+def _is_delegated(task):
+    return bool(task.delegated_to)
+
+
+def task_capacity_contributions(task):
+    """Retorna (Counter {date: minutos}, Counter {date: variação projetada}) da tarefa"""
+    fixed = Counter()
+    projected = Counter()
+
+    if task is None or _is_delegated(task):
+        return fixed, projected
+
+    fixed[task.date_scheduled] += task.duration_minutes
+
+    if task.is_repeatable and task.status == TaskStatus.ACTIVE:
+        if task.repeat_days and task.repeat_days > 0:
+            if task.repeat_days > 1:
+                projected[task.date_scheduled + timedelta(days=1)] += task.duration_minutes
+                projected[task.date_scheduled + timedelta(days=task.repeat_days)] -= task.duration_minutes
+        else:
+            projected[task.date_scheduled + timedelta(days=1)] += task.duration_minutes
+
+    return fixed, projected
+
+
+def sync_task_capacity(user_id, before, task):
+    """Aplica ao ledger a diferença entre a contribuição anterior (before) e a atual da tarefa"""
+    fixed_before, projected_before = before
+    fixed_after, projected_after = task_capacity_contributions(task)
+
+    fixed_after.subtract(fixed_before)
+    projected_after.subtract(projected_before)
+
+    for day, minutes in fixed_after.items():
+        if minutes:
+            _upsert(CapacityLedger, CapacityLedger.minutes, user_id, day, minutes)
+    for day, minutes in projected_after.items():
+        if minutes:
+            _upsert(CapacityProjection, CapacityProjection.minutes_delta, user_id, day, minutes)
+
+
+def _upsert(model, value_column, user_id, day, minutes):
+    statement = sqlite_insert(model).values(
+        {'user_id': user_id, 'date': day, value_column.key: minutes}
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'date'],
+        set_={value_column.key: value_column + statement.excluded[value_column.key]}
+    ))
+
+
+def _aggregate_capacity(*criteria):
+    """(linhas de ledger, linhas de projeção) agregadas das tarefas que atendem criteria"""
+    not_delegated = or_(Task.delegated_to.is_(None), Task.delegated_to == '')
+
+    fixed = db.session.query(
+        Task.user_id, Task.date_scheduled, func.sum(Task.duration_minutes)
+    ).filter(
+        Task.user_id.isnot(None), not_delegated, *criteria
+    ).group_by(Task.user_id, Task.date_scheduled).all()
+
+    repeatable = and_(
+        Task.user_id.isnot(None),
+        Task.is_repeatable == True,
+        Task.status == TaskStatus.ACTIVE,
+        not_delegated,
+        *criteria
+    )
+    starts = db.session.query(
+        Task.user_id,
+        type_coerce(func.date(Task.date_scheduled, '+1 day'), db.Date),
+        func.sum(Task.duration_minutes)
+    ).filter(
+        repeatable,
+        or_(Task.repeat_days.is_(None), Task.repeat_days <= 0, Task.repeat_days > 1)
+    ).group_by(Task.user_id, func.date(Task.date_scheduled, '+1 day')).all()
+
+    end_day = func.date(
+        Task.date_scheduled, literal('+').concat(cast(Task.repeat_days, String)).concat(' days')
+    )
+    ends = db.session.query(
+        Task.user_id, type_coerce(end_day, db.Date), -func.sum(Task.duration_minutes)
+    ).filter(
+        repeatable, Task.repeat_days > 1
+    ).group_by(Task.user_id, end_day).all()
+
+    projected = Counter()
+    for user_id, day, minutes in starts + ends:
+        projected[(user_id, day)] += minutes
+
+    return fixed, projected
+
+
+def subtract_tasks_from_capacity(*criteria):
+    """Remove do ledger a contribuição das tarefas que serão apagadas/alteradas em lote"""
+    fixed, projected = _aggregate_capacity(*criteria)
+    for user_id, day, minutes in fixed:
+        _upsert(CapacityLedger, CapacityLedger.minutes, user_id, day, -minutes)
+    for (user_id, day), minutes in projected.items():
+        if minutes:
+            _upsert(CapacityProjection, CapacityProjection.minutes_delta, user_id, day, -minutes)
+
+
+def add_tasks_to_capacity(*criteria):
+    """Soma ao ledger a contribuição das tarefas inseridas/alteradas em lote"""
+    fixed, projected = _aggregate_capacity(*criteria)
+    for user_id, day, minutes in fixed:
+        _upsert(CapacityLedger, CapacityLedger.minutes, user_id, day, minutes)
+    for (user_id, day), minutes in projected.items():
+        if minutes:
+            _upsert(CapacityProjection, CapacityProjection.minutes_delta, user_id, day, minutes)
+
+
+def rebuild_capacity_ledger():
+    """Recalcula todo o ledger a partir das tarefas (não faz commit)"""
+    db.session.query(CapacityLedger).delete()
+    db.session.query(CapacityProjection).delete()
+
+    fixed, projected = _aggregate_capacity()
+    db.session.bulk_insert_mappings(CapacityLedger, [
+        {'user_id': user_id, 'date': day, 'minutes': minutes}
+        for user_id, day, minutes in fixed
+    ])
+    db.session.bulk_insert_mappings(CapacityProjection, [
+        {'user_id': user_id, 'date': day, 'minutes_delta': minutes}
+        for (user_id, day), minutes in projected.items() if minutes
+    ])
+
+
+def init_capacity_ledger():
+    """Popula o ledger na primeira execução (tabela vazia com tarefas já existentes)"""
+    if db.session.query(CapacityLedger.id).first() is not None:
+        return
+    rebuild_capacity_ledger()
+    db.session.commit()
+
+
+def get_used_minutes(user_id, target_date):
+    """Minutos ocupados no dia: busca pela chave no ledger + soma das variações projetadas"""
+    fixed = select(CapacityLedger.minutes).where(
+        CapacityLedger.user_id == user_id,
+        CapacityLedger.date == target_date
+    ).scalar_subquery()
+    projected = select(func.sum(CapacityProjection.minutes_delta)).where(
+        CapacityProjection.user_id == user_id,
+        CapacityProjection.date <= target_date
+    ).scalar_subquery()
+
+    return db.session.execute(
+        select(func.coalesce(fixed, 0) + func.coalesce(projected, 0))
+    ).scalar()
+
+
+def get_used_minutes_map(user_id, start_date, end_date):
+    """Retorna {date: minutos ocupados} para cada dia em [start_date, end_date]"""
+    fixed = dict(db.session.query(CapacityLedger.date, CapacityLedger.minutes).filter(
+        CapacityLedger.user_id == user_id,
+        CapacityLedger.date >= start_date,
+        CapacityLedger.date <= end_date
+    ).all())
+
+    projected = db.session.query(func.sum(CapacityProjection.minutes_delta)).filter(
+        CapacityProjection.user_id == user_id,
+        CapacityProjection.date < start_date
+    ).scalar() or 0
+
+    deltas = dict(db.session.query(CapacityProjection.date, CapacityProjection.minutes_delta).filter(
+        CapacityProjection.user_id == user_id,
+        CapacityProjection.date >= start_date,
+        CapacityProjection.date <= end_date
+    ).all())
+
+    used = {}
+    current_date = start_date
+    while current_date <= end_date:
+        projected += deltas.get(current_date, 0)
+        used[current_date] = fixed.get(current_date, 0) + projected
+        current_date += timedelta(days=1)
+    return used
@@ -0,0 +1,99 @@
+"""
+DB Routing - Leituras em conexões somente leitura, escritas no engine principal
+
+Requests GET/HEAD/OPTIONS usam um pool de conexões SQLite somente leitura
+(mode=ro, query_only): em WAL, cada transação de leitura lê um snapshot
+e nunca espera o escritor, nem o job de meia-noite ou o backup. As demais
+requests, os jobs do scheduler e scripts usam o engine principal, com um
+pool pequeno (SQLITE_WRITE_POOL_SIZE): trabalho lento de um request de
+escrita (hash de senha, upload de foto) não segura os demais, e quem
+disputa o lock de escrita do SQLite espera pelo busy_timeout.
+
+É transparente para as rotas: db.session escolhe o engine a cada
+statement. Nenhuma rota GET escreve no banco; uma que passe a escrever
+falha com "attempt to write a readonly database" (deve virar POST/PUT).
+
+SQLITE_READ_POOL_SIZE = 0 desliga a separação (tudo no engine principal).
+"""
+
+from flask import g, request, current_app, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event, make_url
+
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+EXTENSION_KEY = 'triade_read_engine'
+
+
+class RoutingSession(Session):
+    """Session do Flask-SQLAlchemy que manda as leituras de requests GET para o pool somente leitura"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and g.get('db_read_only'):
+            read_engine = current_app.extensions.get(EXTENSION_KEY)
+            if read_engine is not None:
+                return read_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def read_split_enabled(config):
+    """Separação só vale para SQLite em arquivo"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    return (
+        config.get('SQLITE_READ_POOL_SIZE', 0) > 0
+        and url.get_backend_name() == 'sqlite'
+        and url.database not in (None, '', ':memory:')
+    )
+
+
+def configure_writer_pool(app):
+    """Com a separação ligada, o engine principal fica com o pool pequeno de escrita (chamar antes de db.init_app)"""
+    if not read_split_enabled(app.config):
+        return
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.update(
+        pool_size=max(app.config.get('SQLITE_WRITE_POOL_SIZE', 4), 1),
+        max_overflow=app.config.get('SQLITE_WRITE_POOL_MAX_OVERFLOW', 4)
+    )
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def configure_read_engine(app, db, pragmas):
+    """
+    Cria o pool somente leitura sobre o mesmo arquivo do engine principal e
+    liga o roteamento por método HTTP (chamar no app context, depois das
+    migrações, com os PRAGMAs de leitura do perfil)
+    """
+    if not read_split_enabled(app.config):
+        return None
+
+    url = db.engine.url
+    read_engine = create_engine(
+        f'sqlite:///file:{url.database}?mode=ro&uri=true',
+        pool_size=app.config['SQLITE_READ_POOL_SIZE'],
+        max_overflow=app.config.get('SQLITE_READ_POOL_MAX_OVERFLOW', 10),
+        pool_timeout=app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).get('pool_timeout', 30)
+    )
+
+    @event.listens_for(read_engine, 'connect')
+    def apply_read_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    app.extensions[EXTENSION_KEY] = read_engine
+
+    @app.before_request
+    def route_reads_to_read_engine():
+        g.db_read_only = request.method in READ_METHODS
+
+    return read_engine
+
+
+def dispose_read_engine(app):
+    """Descarta as conexões de leitura (depois de trocar o arquivo do banco)"""
+    read_engine = app.extensions.get(EXTENSION_KEY)
+    if read_engine is not None:
+        read_engine.dispose()
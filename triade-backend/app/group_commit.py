@@ -0,0 +1,177 @@
+"""
+Group Commit - Fila de escritas pequenas confirmadas em lote
+
+Toques rápidos em sequência (toggle-date, skip) viram, cada um, uma
+operação na fila. Uma thread dedicada junta as operações que chegarem em
+até GROUP_COMMIT_WINDOW_MS (no máximo GROUP_COMMIT_MAX_BATCH), executa
+todas na mesma transação e faz um único commit (um fsync para o lote).
+Cada request só responde depois do commit do lote em que entrou.
+
+Cada operação roda dentro de um SAVEPOINT: se ela falhar (ex.: 404 de
+tarefa inexistente), só ela volta e recebe o erro; as demais continuam no
+mesmo commit. Se o commit do lote falhar, todas recebem o erro.
+
+Um request que esperar mais que WAIT_TIMEOUT_SECONDS cancela a operação
+se ela ainda estiver na fila (não será aplicada). Se o lote dela já
+começou, o resultado é desconhecido: a escrita ainda pode ser confirmada.
+
+Opcional: GROUP_COMMIT_ENABLED (desligado = commit por request, como antes).
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from app import db
+from app.job_runs import acquire_write_lock
+
+DEFAULT_WINDOW_MS = 5
+DEFAULT_MAX_BATCH = 64
+WAIT_TIMEOUT_SECONDS = 30
+
+
+class GroupCommitTimeout(Exception):
+    """
+    O lote não confirmou a tempo. cancelled=True: a operação saiu da fila e
+    não será aplicada; False: já estava em um lote e ainda pode ser aplicada.
+    """
+
+    def __init__(self, cancelled):
+        super().__init__(
+            'Escrita cancelada: a fila de commits não respondeu a tempo' if cancelled
+            else 'Escrita ainda em processamento: pode ser aplicada'
+        )
+        self.cancelled = cancelled
+
+
+class GroupCommitQueue:
+    def __init__(self):
+        self.enabled = False
+        self._app = None
+        self._window = DEFAULT_WINDOW_MS / 1000
+        self._max_batch = DEFAULT_MAX_BATCH
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._operations = 0
+        self._operation_errors = 0
+        self._failed_batches = 0
+        self._cancelled = 0
+        self._commit_ms = 0.0
+
+    def configure(self, app):
+        self._app = app
+        self.enabled = app.config.get('GROUP_COMMIT_ENABLED', False)
+        self._window = app.config.get('GROUP_COMMIT_WINDOW_MS', DEFAULT_WINDOW_MS) / 1000
+        self._max_batch = max(app.config.get('GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH), 1)
+
+    def _ensure_started(self):
+        # A thread nasce no primeiro uso: depois do fork de cada worker
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+
+    def submit(self, operation, *args):
+        """
+        Enfileira operation(*args) (sem commit, usando db.session) e espera o
+        commit do lote. Retorna o resultado da operação, levanta o erro dela
+        ou GroupCommitTimeout. Fecha a sessão do request antes de esperar: a
+        transação dele não pode segurar o lock do SQLite durante o lote.
+        """
+        self._ensure_started()
+        db.session.close()
+
+        future = Future()
+        self._queue.put((operation, args, future))
+        try:
+            return future.result(timeout=WAIT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            # Ainda na fila: cancela (a thread do lote descarta). Já em um lote: não dá mais
+            cancelled = future.cancel()
+            if cancelled:
+                with self._stats_lock:
+                    self._cancelled += 1
+            raise GroupCommitTimeout(cancelled)
+
+    def _run(self):
+        with self._app.app_context():
+            while True:
+                batch = [self._queue.get()]
+                deadline = time.monotonic() + self._window
+                while len(batch) < self._max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(self._queue.get(timeout=remaining))
+                    except queue.Empty:
+                        break
+
+                try:
+                    self._commit_batch(batch)
+                finally:
+                    db.session.remove()
+
+    def _commit_batch(self, batch):
+        # Marca como em execução; operações canceladas pelo timeout ficam de fora
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        outcomes = []
+        try:
+            # Abre a transação antes dos SAVEPOINTs (o pysqlite só emite BEGIN
+            # antes de DML; sem isso, o RELEASE do primeiro savepoint faria commit)
+            acquire_write_lock()
+            for operation, args, future in batch:
+                try:
+                    with db.session.begin_nested():
+                        result = operation(*args)
+                except Exception as e:
+                    outcomes.append((future, None, e))
+                else:
+                    outcomes.append((future, result, None))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            with self._stats_lock:
+                self._failed_batches += 1
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        errors = sum(1 for _, _, error in outcomes if error is not None)
+        with self._stats_lock:
+            self._batches += 1
+            self._operations += len(batch)
+            self._operation_errors += errors
+            self._commit_ms += (time.perf_counter() - started) * 1000
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'enabled': self.enabled,
+                'window_ms': round(self._window * 1000, 2),
+                'max_batch': self._max_batch,
+                'queued': self._queue.qsize(),
+                'batches': self._batches,
+                'operations': self._operations,
+                'avg_batch_size': round(self._operations / self._batches, 2) if self._batches else None,
+                'avg_batch_ms': round(self._commit_ms / self._batches, 2) if self._batches else None,
+                'operation_errors': self._operation_errors,
+                'failed_batches': self._failed_batches,
+                'cancelled': self._cancelled
+            }
+
+
+group_commit = GroupCommitQueue()
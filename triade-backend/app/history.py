@@ -0,0 +1,147 @@
+"""
+History - Histórico de tarefas concluídas
+
+Une em uma única query (UNION ALL) as tarefas normais concluídas e as
+conclusões (TaskCompletion) das tarefas repetíveis, ordenadas por
+completed_at. A paginação é por cursor (keyset): cada ramo do UNION já é
+filtrado pelo cursor e limitado antes da união, então a página N custa o
+mesmo que a página 1. A busca usa o índice FTS5 (app.search).
+"""
+
+import base64
+from datetime import datetime, date
+from sqlalchemy import select, union_all, func, cast, type_coerce, and_, or_, String
+
+from app import db
+from app.models import Task, TaskCompletion, TaskStatus
+from app.search import task_match_clause
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(item):
+    """Cursor opaco a partir do último item da página (completed_at, id, date)"""
+    raw = f"{item['completed_at'].isoformat()}|{item['id']}|{item['date_scheduled'].isoformat()}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        completed_at, task_id, day = raw.split('|')
+        return datetime.fromisoformat(completed_at), int(task_id), date.fromisoformat(day)
+    except Exception:
+        raise InvalidCursor('Cursor inválido')
+
+
+def _after_cursor(completed_col, id_col, date_col, cursor):
+    """Keyset: itens estritamente depois do cursor na ordem (completed_at, id, date) DESC"""
+    completed_at, task_id, day = cursor
+    return or_(
+        completed_col < completed_at,
+        and_(
+            completed_col == completed_at,
+            or_(
+                id_col < task_id,
+                and_(id_col == task_id, date_col < day)
+            )
+        )
+    )
+
+
+def _history_branches(user_id, search_term=None, cursor=None, limit=None):
+    """Monta os dois ramos do histórico já filtrados, ordenados e limitados"""
+    # Ramo 1: tarefas normais concluídas
+    normal_completed = Task.completed_at
+    normal = select(
+        Task.id.label('id'),
+        Task.title.label('title'),
+        Task.energy_level.label('energy_level'),
+        Task.duration_minutes.label('duration_minutes'),
+        normal_completed.label('completed_at'),
+        Task.date_scheduled.label('date_scheduled'),
+        Task.context_tag.label('context_tag'),
+        Task.role_tag.label('role_tag'),
+        Task.description.label('description')
+    ).where(
+        Task.user_id == user_id,
+        Task.status == TaskStatus.DONE,
+        Task.completed_at.isnot(None),
+        Task.is_repeatable == False
+    )
+
+    # Ramo 2: conclusões de tarefas repetíveis (sem completed_at usa o início do dia)
+    repeat_completed = type_coerce(
+        func.coalesce(
+            TaskCompletion.completed_at,
+            cast(TaskCompletion.date, String).concat(' 00:00:00.000000')
+        ),
+        db.DateTime
+    )
+    repeated = select(
+        Task.id.label('id'),
+        Task.title.label('title'),
+        Task.energy_level.label('energy_level'),
+        Task.duration_minutes.label('duration_minutes'),
+        repeat_completed.label('completed_at'),
+        TaskCompletion.date.label('date_scheduled'),
+        Task.context_tag.label('context_tag'),
+        Task.role_tag.label('role_tag'),
+        Task.description.label('description')
+    ).join(
+        Task, Task.id == TaskCompletion.task_id
+    ).where(
+        Task.user_id == user_id,
+        TaskCompletion.status == TaskStatus.DONE,
+        Task.is_repeatable == True
+    )
+
+    branches = []
+    for branch, completed_col, date_col in (
+        (normal, normal_completed, Task.date_scheduled),
+        (repeated, repeat_completed, TaskCompletion.date)
+    ):
+        if search_term:
+            branch = branch.where(task_match_clause(search_term))
+        if cursor:
+            branch = branch.where(_after_cursor(completed_col, Task.id, date_col, cursor))
+        if limit is not None:
+            branch = branch.order_by(
+                completed_col.desc(), Task.id.desc(), date_col.desc()
+            ).limit(limit)
+            # SQLite não aceita ORDER BY/LIMIT direto em membros de UNION
+            branch = select(branch.subquery())
+        branches.append(branch)
+    return branches
+
+
+def fetch_history(user_id, per_page, search_term=None, cursor=None, offset=0):
+    """
+    Retorna (itens, has_next) do histórico a partir do cursor (ou offset legado).
+    Cada item é um dict com completed_at/date_scheduled ainda como datetime/date.
+    """
+    limit = offset + per_page + 1
+    history = union_all(
+        *_history_branches(user_id, search_term, cursor, limit)
+    ).subquery('history')
+
+    rows = db.session.execute(
+        select(history).order_by(
+            history.c.completed_at.desc(),
+            history.c.id.desc(),
+            history.c.date_scheduled.desc()
+        ).offset(offset).limit(per_page + 1)
+    ).mappings().all()
+
+    items = [dict(row) for row in rows[:per_page]]
+    for item in items:
+        item['energy_level'] = item['energy_level'].value
+    return items, len(rows) > per_page
+
+
+def count_history(user_id, search_term=None):
+    """Total de itens do histórico (usado apenas pela paginação por página)"""
+    history = union_all(*_history_branches(user_id, search_term)).subquery('history')
+    return db.session.execute(select(func.count()).select_from(history)).scalar()
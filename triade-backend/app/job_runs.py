@@ -0,0 +1,154 @@
+"""
+Job Runs - Histórico e métricas das execuções de jobs
+
+Cada execução (virada de dia, backup, limpeza...) vira uma linha em
+job_runs, gravada como 'running' no início (antes disso 'queued', se o
+job roda em background) e fechada no fim com duração, linhas afetadas e
+espera por lock por fase, ou com o erro. Uso:
+
+    with record_job_run('backup') as run:
+        ...
+        run.add_phase('copy', rows=1, duration_ms=12.5)
+
+Resumos de _run_chunked (app/scheduler.py) entram direto com add_summary.
+"""
+
+import json
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text
+
+from app import db
+from app.models import JobRun
+from app.lease import holder_id
+
+DEFAULT_RETENTION_DAYS = 90
+
+
+def acquire_write_lock():
+    """
+    Abre a transação de escrita agora (no-op que pega o lock RESERVED do
+    SQLite) e retorna quanto tempo, em ms, esperou por outros escritores.
+    """
+    started = time.perf_counter()
+    db.session.execute(text("UPDATE job_runs SET id = id WHERE 0"))
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+class JobRunRecorder:
+    """Acumula as fases de uma execução"""
+
+    def __init__(self, run_id):
+        self.run_id = run_id
+        self.phases = []
+
+    def add_phase(self, name, rows=0, duration_ms=None, lock_wait_ms=0, **extra):
+        phase = {'name': name, 'rows': rows, 'duration_ms': duration_ms, 'lock_wait_ms': lock_wait_ms}
+        phase.update(extra)
+        self.phases.append(phase)
+        return phase
+
+    def add_summary(self, summary):
+        """Fase a partir do resumo de _run_chunked (com as faixas)"""
+        return self.add_phase(
+            summary['job'],
+            rows=summary['rows'],
+            duration_ms=summary['duration_ms'],
+            lock_wait_ms=summary.get('lock_wait_ms', 0),
+            chunks=summary['chunks']
+        )
+
+
+def create_job_run(job, **details):
+    """Cria a execução como 'queued' (para jobs em background) e retorna o id"""
+    run = JobRun(
+        job=job,
+        status='queued',
+        holder=holder_id(),
+        details=json.dumps(details, default=str) if details else None,
+        started_at=datetime.utcnow()
+    )
+    db.session.add(run)
+    db.session.commit()
+    return run.id
+
+
+@contextmanager
+def record_job_run(job, run_id=None, **details):
+    """
+    Registra a execução em job_runs; exceções são gravadas e propagadas.
+    Com run_id, continua uma execução criada por create_job_run.
+    """
+    if run_id is None:
+        run_id = create_job_run(job, **details)
+    run = db.session.get(JobRun, run_id)
+    run.status = 'running'
+    run.holder = holder_id()
+    run.started_at = datetime.utcnow()
+    db.session.commit()
+
+    recorder = JobRunRecorder(run.id)
+    started = time.perf_counter()
+    error = None
+    try:
+        yield recorder
+    except Exception:
+        db.session.rollback()
+        error = traceback.format_exc(limit=5)
+        raise
+    finally:
+        _finish_run(recorder, started, error)
+
+
+def _finish_run(recorder, started, error):
+    try:
+        run = db.session.get(JobRun, recorder.run_id)
+        run.status = 'failed' if error else 'success'
+        run.finished_at = datetime.utcnow()
+        run.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        run.rows = sum(phase['rows'] or 0 for phase in recorder.phases)
+        run.lock_wait_ms = round(sum(phase['lock_wait_ms'] or 0 for phase in recorder.phases), 2)
+        run.phases = json.dumps(recorder.phases, default=str)
+        run.error = error
+
+        retention = current_app.config.get('JOB_RUNS_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+        JobRun.query.filter(
+            JobRun.started_at < run.started_at - timedelta(days=retention)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"[JOB_RUNS] Erro ao registrar execução {recorder.run_id}: {e}")
+
+
+def summarize_job_runs(since):
+    """Métricas por job desde `since` (UTC): contagem, falhas, duração média/p95/máx..."""
+    runs = JobRun.query.filter(JobRun.started_at >= since).order_by(JobRun.started_at).all()
+
+    by_job = {}
+    for run in runs:
+        by_job.setdefault(run.job, []).append(run)
+
+    summary = {}
+    for job, job_runs in by_job.items():
+        durations = sorted(run.duration_ms for run in job_runs if run.duration_ms is not None)
+        successes = [run for run in job_runs if run.status == 'success']
+        last = job_runs[-1]
+        summary[job] = {
+            'runs': len(job_runs),
+            'failures': sum(1 for run in job_runs if run.status == 'failed'),
+            'running': sum(1 for run in job_runs if run.status in ('queued', 'running')),
+            'rows': sum(run.rows or 0 for run in job_runs),
+            'avg_duration_ms': round(sum(durations) / len(durations), 2) if durations else None,
+            'p95_duration_ms': durations[min(len(durations) - 1, int(len(durations) * 0.95))] if durations else None,
+            'max_duration_ms': durations[-1] if durations else None,
+            'avg_lock_wait_ms': round(sum(run.lock_wait_ms or 0 for run in job_runs) / len(job_runs), 2),
+            'last_status': last.status,
+            'last_started_at': last.started_at.isoformat(),
+            'last_success_at': successes[-1].finished_at.isoformat() if successes else None,
+            'last_error': next((run.error for run in reversed(job_runs) if run.error), None)
+        }
+    return summary
@@ -0,0 +1,86 @@
+"""
+Lease - Liderança entre processos para os jobs agendados
+
+Cada worker inicia seu BackgroundScheduler, mas só o processo que detém o
+lease (linha em scheduler_leases) executa os jobs. O líder renova o lease
+periodicamente; se ele morrer, o lease expira e o primeiro worker a tentar
+de novo assume. A aquisição é um único upsert condicional, então dois
+processos nunca saem com o mesmo lease.
+"""
+
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import or_, case
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import SchedulerLease
+
+_holder_ids = {}
+
+
+def holder_id():
+    """
+    Identidade deste processo: host:pid:token. Calculada por pid, para que
+    workers criados por fork depois do import não herdem a do processo pai.
+    """
+    pid = os.getpid()
+    if pid not in _holder_ids:
+        _holder_ids[pid] = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+    return _holder_ids[pid]
+
+
+def acquire_lease(name, ttl_seconds, holder=None):
+    """
+    Adquire ou renova o lease. Retorna True se este holder é o líder até
+    agora + ttl_seconds; False se outro processo tem um lease válido.
+    """
+    holder = holder or holder_id()
+    now = datetime.utcnow()
+    statement = sqlite_insert(SchedulerLease).values(
+        name=name,
+        holder=holder,
+        acquired_at=now,
+        expires_at=now + timedelta(seconds=ttl_seconds)
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[SchedulerLease.name],
+        set_={
+            'holder': statement.excluded.holder,
+            'expires_at': statement.excluded.expires_at,
+            'acquired_at': case(
+                (SchedulerLease.holder == holder, SchedulerLease.acquired_at),
+                else_=statement.excluded.acquired_at
+            )
+        },
+        where=or_(SchedulerLease.holder == holder, SchedulerLease.expires_at < now)
+    )
+
+    try:
+        acquired = db.session.execute(statement).rowcount == 1
+        db.session.commit()
+        return acquired
+    except Exception as e:
+        db.session.rollback()
+        print(f"[LEASE] Erro ao adquirir lease {name}: {e}")
+        return False
+
+
+def release_lease(name, holder=None):
+    """Libera o lease (se ainda for deste holder) para um standby assumir já"""
+    holder = holder or holder_id()
+    try:
+        db.session.query(SchedulerLease).filter(
+            SchedulerLease.name == name,
+            SchedulerLease.holder == holder
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+
+def get_lease(name):
+    """Lease atual (ou None), para diagnóstico"""
+    return db.session.get(SchedulerLease, name)
@@ -2,12 +2,17 @@ from datetime import datetime, timezone, timedelta
 from app import db
 from sqlalchemy import Enum as SQLEnum, Index
 from werkzeug.security import generate_password_hash, check_password_hash
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import enum
+import json
 import re
 
 # 🔥 NOVO: Define timezone do Brasil
 BRAZIL_TZ = timezone(timedelta(hours=-3))
 
+# Fuso padrão dos usuários (IANA)
+DEFAULT_TIMEZONE = 'America/Sao_Paulo'
+
 def get_brazil_time():
     """Retorna horário atual no timezone do Brasil"""
     return datetime.now(BRAZIL_TZ).replace(tzinfo=None)
@@ -23,14 +28,17 @@ class User(db.Model):
     personal_name = db.Column(db.String(30), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     password_hash = db.Column(db.String(256), nullable=False)
-    profile_photo = db.Column(db.LargeBinary, nullable=True)  # Foto em bytes (max 2MB)
+    # Bytes da foto ficam em UserPhoto; aqui só o mimetype (None = sem foto)
     profile_photo_mimetype = db.Column(db.String(50), nullable=True)  # Ex: image/jpeg
+    timezone = db.Column(db.String(50), nullable=False, default=DEFAULT_TIMEZONE,
+                         server_default=DEFAULT_TIMEZONE)  # IANA, ex: America/Manaus
     created_at = db.Column(db.DateTime, default=get_brazil_time)
     updated_at = db.Column(db.DateTime, default=get_brazil_time, onupdate=get_brazil_time)
 
     # Relacionamento com tarefas
     tasks = db.relationship('Task', backref='owner', lazy='dynamic')
     daily_configs = db.relationship('DailyConfig', backref='owner', lazy='dynamic')
+    photo = db.relationship('UserPhoto', uselist=False, cascade='all, delete-orphan')
 
     def set_password(self, password):
         """Gera hash seguro da senha usando Werkzeug"""
@@ -71,18 +79,41 @@ class User(db.Model):
             return False, "Senha deve conter pelo menos 1 caractere especial"
         return True, None
 
+    @staticmethod
+    def validate_timezone(name):
+        """Valida nome de fuso IANA (ex: America/Sao_Paulo)"""
+        if not name or len(name) > 50:
+            return False, "Fuso horário inválido"
+        try:
+            ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            return False, "Fuso horário inválido"
+        return True, None
+
     def to_dict(self, include_photo=False):
         data = {
             'id': self.id,
             'username': self.username,
             'personal_name': self.personal_name,
             'email': self.email,
-            'has_photo': self.profile_photo is not None,
+            'has_photo': self.profile_photo_mimetype is not None,
+            'timezone': self.timezone,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
         return data
 
 
+class UserPhoto(db.Model):
+    """Foto de perfil: metadados aqui, conteúdo em disco pelo hash (ver app/photos.py)"""
+    __tablename__ = 'user_photos'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)  # SHA-256
+    mimetype = db.Column(db.String(50), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    updated_at = db.Column(db.DateTime, default=get_brazil_time, onupdate=get_brazil_time)
+
+
 # ==================== ENUMS ====================
 
 class EnergyLevel(enum.Enum):
@@ -189,6 +220,133 @@ class TaskCompletion(db.Model):
         db.UniqueConstraint('task_id', 'date', name='unique_task_date_completion'),
     )
 
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task_id': self.task_id,
+            'date': self.date.isoformat(),
+            'status': self.status.value,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class EnergyRollup(db.Model):
+    """Minutos concluídos por usuário, dia e nível de energia (mantido incrementalmente)"""
+    __tablename__ = 'energy_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    energy_level = db.Column(SQLEnum(EnergyLevel), nullable=False)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', 'energy_level', name='unique_user_date_energy'),
+    )
+
+
+class CapacityLedger(db.Model):
+    """Minutos ocupados por tarefas reais (não delegadas) em cada dia do usuário"""
+    __tablename__ = 'capacity_ledger'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='unique_user_date_ledger'),
+    )
+
+
+class CapacityProjection(db.Model):
+    """
+    Variação dos minutos projetados por repetíveis a partir de cada dia.
+    Os minutos projetados em um dia são a soma das variações até ele.
+    """
+    __tablename__ = 'capacity_projections'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    minutes_delta = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='unique_user_date_projection'),
+    )
+
+
+class ChangeLog(db.Model):
+    """Log append-only de mutações (preenchido por triggers do SQLite, ver app/sync.py)"""
+    __tablename__ = 'change_log'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    entity = db.Column(db.String(20), nullable=False)  # task, task_completion, daily_config
+    entity_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(10), nullable=False)  # upsert, delete
+    changed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        {'sqlite_autoincrement': True},
+    )
+
+
+# ==================== SCHEDULER ====================
+
+class SchedulerLease(db.Model):
+    """Lease de liderança dos jobs agendados: só o holder com lease válido executa"""
+    __tablename__ = 'scheduler_leases'
+
+    name = db.Column(db.String(50), primary_key=True)
+    holder = db.Column(db.String(100), nullable=False)  # host:pid:token do processo
+    acquired_at = db.Column(db.DateTime, nullable=False)  # UTC
+    expires_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+
+class RolloverState(db.Model):
+    """Último dia local já virado (jobs de meia-noite) por fuso horário"""
+    __tablename__ = 'rollover_state'
+
+    timezone = db.Column(db.String(50), primary_key=True)
+    last_local_date = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)  # UTC
+
+
+class JobRun(db.Model):
+    """Execução de um job (virada, backup, limpeza...) com métricas por fase"""
+    __tablename__ = 'job_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(10), nullable=False)  # queued, running, success, failed
+    holder = db.Column(db.String(100), nullable=True)  # processo que executou
+    details = db.Column(db.Text, nullable=True)  # JSON: parâmetros (fusos, data...)
+    started_at = db.Column(db.DateTime, nullable=False)  # UTC
+    finished_at = db.Column(db.DateTime, nullable=True)  # UTC
+    duration_ms = db.Column(db.Float, nullable=True)
+    rows = db.Column(db.Integer, nullable=False, default=0)
+    lock_wait_ms = db.Column(db.Float, nullable=False, default=0)
+    phases = db.Column(db.Text, nullable=True)  # JSON: [{name, rows, duration_ms, lock_wait_ms, ...}]
+    error = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job': self.job,
+            'status': self.status,
+            'holder': self.holder,
+            'details': json.loads(self.details) if self.details else None,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_ms': self.duration_ms,
+            'rows': self.rows,
+            'lock_wait_ms': self.lock_wait_ms,
+            'phases': json.loads(self.phases) if self.phases else [],
+            'error': self.error
+        }
+
 
 # ==================== INDEXES ====================
 
@@ -197,4 +355,9 @@ Index('idx_task_date_status', Task.date_scheduled, Task.status)
 Index('idx_task_repeatable', Task.is_repeatable, Task.status)
 Index('idx_completion_user_task', TaskCompletion.user_id, TaskCompletion.task_id)
 Index('idx_completion_task_date', TaskCompletion.task_id, TaskCompletion.date)
-Index('idx_daily_config_user', DailyConfig.user_id, DailyConfig.date)
\ No newline at end of file
+Index('idx_daily_config_user', DailyConfig.user_id, DailyConfig.date)
+Index('idx_task_user_completed', Task.user_id, Task.completed_at)
+Index('idx_change_log_user', ChangeLog.user_id, ChangeLog.id)
+Index('idx_user_timezone', User.timezone, User.id)
+Index('idx_job_run_job_started', JobRun.job, JobRun.started_at)
+Index('idx_job_run_started', JobRun.started_at)
@@ -0,0 +1,211 @@
+"""
+Photos - Armazenamento das fotos de perfil
+
+As fotos ficam em disco, endereçadas pelo SHA-256 do conteúdo (a mesma
+imagem é gravada uma única vez, mesmo se enviada por vários usuários):
+
+    <AVATAR_STORAGE_DIR>/<hash[:2]>/<hash>/original|medium|small
+
+user_photos guarda só hash, mimetype e tamanho; users guarda apenas
+profile_photo_mimetype, que também indica se o usuário tem foto. As
+variantes medium/small são geradas em um pool de threads depois do upload
+(se o Pillow não estiver instalado, ou enquanto não ficarem prontas, a
+original é servida no lugar).
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+
+from sqlalchemy import text, func
+
+from app import db
+from app.models import UserPhoto, get_brazil_time
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow é opcional: sem ele não há miniaturas
+    Image = None
+
+# variante -> lado máximo em pixels (None = original)
+PHOTO_VARIANTS = {
+    'small': 64,
+    'medium': 256,
+    'original': None,
+}
+
+_storage_dir = None
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='avatar')
+
+
+def configure_photo_storage(app):
+    """Define a pasta do armazenamento (padrão: <instance>/avatars)"""
+    global _storage_dir
+    _storage_dir = Path(app.config.get('AVATAR_STORAGE_DIR') or os.path.join(app.instance_path, 'avatars'))
+    _storage_dir.mkdir(parents=True, exist_ok=True)
+
+
+def _blob_dir(content_hash):
+    return _storage_dir / content_hash[:2] / content_hash
+
+
+def _write_atomic(path, data):
+    """Grava em arquivo temporário e renomeia (leitores nunca veem arquivo parcial)"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(data)
+    os.replace(tmp_path, path)
+
+
+def store_blob(photo_bytes):
+    """Grava a original (se ainda não existir) e agenda as variantes. Retorna o hash."""
+    content_hash = hashlib.sha256(photo_bytes).hexdigest()
+    blob_dir = _blob_dir(content_hash)
+    blob_dir.mkdir(parents=True, exist_ok=True)
+
+    original = blob_dir / 'original'
+    if not original.exists():
+        _write_atomic(original, photo_bytes)
+
+    if Image is not None and not all((blob_dir / name).exists() for name in PHOTO_VARIANTS):
+        _executor.submit(_build_variants, content_hash)
+    return content_hash
+
+
+def _build_variants(content_hash):
+    """Gera medium/small no mesmo formato da original (roda no pool de threads)"""
+    blob_dir = _blob_dir(content_hash)
+    try:
+        original = (blob_dir / 'original').read_bytes()
+        for name, max_side in PHOTO_VARIANTS.items():
+            target = blob_dir / name
+            if max_side is None or target.exists():
+                continue
+            with Image.open(BytesIO(original)) as image:
+                image_format = image.format or 'PNG'
+                image.thumbnail((max_side, max_side))
+                if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                output = BytesIO()
+                image.save(output, format=image_format)
+            _write_atomic(target, output.getvalue())
+    except FileNotFoundError:
+        pass  # Foto removida antes de a variante ficar pronta
+    except Exception as e:
+        print(f"[PHOTOS] Erro ao gerar variantes de {content_hash}: {e}")
+
+
+def photo_path(content_hash, variant='original'):
+    """
+    (arquivo, variante servida): a variante pedida ou, enquanto ela não
+    existir, a original
+    """
+    blob_dir = _blob_dir(content_hash)
+    path = blob_dir / variant
+    if path.exists():
+        return path, variant
+    return blob_dir / 'original', 'original'
+
+
+def discard_blob_if_unused(content_hash):
+    """Apaga o conteúdo do disco se nenhum usuário referencia mais o hash"""
+    if not content_hash:
+        return
+    in_use = db.session.query(func.count(UserPhoto.user_id)).filter(
+        UserPhoto.content_hash == content_hash
+    ).scalar()
+    if not in_use:
+        shutil.rmtree(_blob_dir(content_hash), ignore_errors=True)
+
+
+# ==================== BANCO ====================
+
+def init_user_photos():
+    """
+    Migra fotos guardadas no banco para o armazenamento em disco (idempotente):
+    a antiga coluna users.profile_photo e a antiga coluna user_photos.data.
+    Bancos novos não têm nenhuma das duas e não fazem nada.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+
+    def columns(table_name):
+        return {row[1] for row in db.session.execute(text(f"PRAGMA table_info({table_name})"))}
+
+    # Grava tudo em disco antes de apagar qualquer coisa do banco
+    migrated = []
+
+    if 'data' in columns('user_photos'):
+        rows = db.session.execute(text(
+            "SELECT user_id, data, mimetype, updated_at FROM user_photos"
+        )).all()
+        migrated += [(row[0], store_blob(row[1]), row[2], len(row[1]), row[3]) for row in rows]
+        db.session.execute(text("DROP TABLE user_photos"))
+        db.session.commit()
+        UserPhoto.__table__.create(db.engine)
+
+    if 'profile_photo' in columns('users'):
+        rows = db.session.execute(text("""
+            SELECT id, profile_photo, COALESCE(profile_photo_mimetype, 'image/jpeg'), updated_at
+            FROM users WHERE profile_photo IS NOT NULL
+        """)).all()
+        migrated += [(row[0], store_blob(row[1]), row[2], len(row[1]), row[3]) for row in rows]
+        db.session.execute(text("""
+            UPDATE users SET profile_photo = NULL,
+                   profile_photo_mimetype = COALESCE(profile_photo_mimetype, 'image/jpeg')
+            WHERE profile_photo IS NOT NULL
+        """))
+
+    for user_id, content_hash, mimetype, size, updated_at in migrated:
+        photo = db.session.get(UserPhoto, user_id) or UserPhoto(user_id=user_id)
+        photo.content_hash = content_hash
+        photo.mimetype = mimetype
+        photo.size = size
+        photo.updated_at = datetime.fromisoformat(updated_at) if updated_at else get_brazil_time()
+        db.session.add(photo)
+    db.session.commit()
+
+    if migrated:
+        print(f"[PHOTOS] {len(migrated)} foto(s) migradas para o armazenamento em disco")
+    return len(migrated)
+
+
+def get_photo(user_id):
+    """Metadados (content_hash, mimetype, updated_at) da foto do usuário ou None"""
+    return db.session.query(
+        UserPhoto.content_hash, UserPhoto.mimetype, UserPhoto.updated_at
+    ).filter(UserPhoto.user_id == user_id).first()
+
+
+def save_photo(user, photo_bytes, mimetype):
+    """
+    Grava/substitui a foto do usuário (commit fica com quem chama).
+    Retorna o hash anterior, para discard_blob_if_unused depois do commit.
+    """
+    photo = db.session.get(UserPhoto, user.id)
+    previous_hash = photo.content_hash if photo else None
+    if photo is None:
+        photo = UserPhoto(user_id=user.id)
+        db.session.add(photo)
+    photo.content_hash = store_blob(photo_bytes)
+    photo.mimetype = mimetype
+    photo.size = len(photo_bytes)
+    user.profile_photo_mimetype = mimetype
+    user.updated_at = get_brazil_time()
+    return previous_hash if previous_hash != photo.content_hash else None
+
+
+def remove_photo(user):
+    """Remove a foto do usuário (commit fica com quem chama). Retorna o hash removido."""
+    photo = db.session.get(UserPhoto, user.id)
+    previous_hash = photo.content_hash if photo else None
+    if photo is not None:
+        db.session.delete(photo)
+    user.profile_photo_mimetype = None
+    user.updated_at = get_brazil_time()
+    return previous_hash
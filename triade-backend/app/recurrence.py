@@ -0,0 +1,222 @@
+"""
+Recurrence - Expansão de tarefas repetíveis
+
+Gera as ocorrências "virtuais" das tarefas repetíveis para uma data ou
+intervalo de datas. A janela de repeat_days e o status vindo de
+TaskCompletion são resolvidos em uma única query SQL (série de datas via
+CTE recursiva + LEFT JOIN nas conclusões), e o resultado vem como
+registros leves (Occurrence) em vez de instâncias ORM de Task.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+from sqlalchemy import select, literal, cast, func, and_, or_, Integer, String
+
+from app import db
+from app.models import Task, TaskCompletion, TaskStatus
+
+
+_OCCURRENCE_FIELDS = (
+    'id', 'title', 'description', 'energy_level', 'duration_minutes', 'status',
+    'date_scheduled', 'scheduled_time', 'role_tag', 'context_tag', 'delegated_to',
+    'follow_up_date', 'is_repeatable', 'repeat_count', 'repeat_days',
+    'completed_at', 'created_at', 'updated_at'
+)
+
+
+class Occurrence(namedtuple('Occurrence', _OCCURRENCE_FIELDS)):
+    """Ocorrência de uma tarefa em uma data (mesmo formato de Task.to_dict)"""
+    __slots__ = ()
+
+    @classmethod
+    def from_task(cls, task, occurrence_date, status, repeat_count):
+        return cls(
+            id=task.id,
+            title=task.title,
+            description=task.description,
+            energy_level=task.energy_level,
+            duration_minutes=task.duration_minutes,
+            status=status,
+            date_scheduled=occurrence_date,
+            scheduled_time=task.scheduled_time,
+            role_tag=task.role_tag,
+            context_tag=task.context_tag,
+            delegated_to=task.delegated_to,
+            follow_up_date=None,
+            is_repeatable=task.is_repeatable,
+            repeat_count=repeat_count,
+            repeat_days=task.repeat_days,
+            completed_at=None,
+            created_at=task.created_at,
+            updated_at=task.updated_at
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'energy_level': self.energy_level.value,
+            'duration_minutes': self.duration_minutes,
+            'status': self.status.value,
+            'date_scheduled': self.date_scheduled.isoformat(),
+            'scheduled_time': self.scheduled_time.strftime('%H:%M') if self.scheduled_time else None,
+            'role_tag': self.role_tag,
+            'context_tag': self.context_tag,
+            'delegated_to': self.delegated_to,
+            'follow_up_date': self.follow_up_date.isoformat() if self.follow_up_date else None,
+            'is_repeatable': self.is_repeatable,
+            'repeat_count': self.repeat_count,
+            'repeat_days': self.repeat_days,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+
+def _day_series(span_days):
+    """CTE recursiva com os offsets 0..span_days (um por dia do intervalo)"""
+    series = select(literal(0).label('n')).cte('day_series', recursive=True)
+    return series.union_all(
+        select(series.c.n + 1).where(series.c.n < span_days)
+    )
+
+
+def _series_columns(start_date, series):
+    """(data da ocorrência como texto ISO, dias desde o início da tarefa) para cada offset"""
+    # Mesmo formato que o SQLite armazena Date, para comparar com TaskCompletion.date
+    occurrence_date = func.date(
+        literal(start_date.isoformat()),
+        literal('+').concat(cast(series.c.n, String)).concat(' days')
+    )
+    days_diff = cast(
+        func.julianday(start_date.isoformat()) - func.julianday(Task.date_scheduled),
+        Integer
+    ) + series.c.n
+    return occurrence_date, days_diff
+
+
+def _within_repeat_window(days_diff):
+    return or_(
+        Task.repeat_days.is_(None),
+        Task.repeat_days <= 0,
+        days_diff < Task.repeat_days
+    )
+
+
+def expand_occurrences(user_id, start_date, end_date=None):
+    """
+    Expande as tarefas repetíveis ACTIVE do usuário no intervalo [start_date, end_date].
+
+    Considera apenas repetíveis que começaram ANTES de cada data (a ocorrência
+    do próprio dia de início é a tarefa real) e ainda dentro de repeat_days.
+    Retorna lista de Occurrence ordenada por data.
+    """
+    end_date = end_date or start_date
+    series = _day_series((end_date - start_date).days)
+    occurrence_date, days_diff = _series_columns(start_date, series)
+
+    rows = db.session.query(Task, series.c.n, TaskCompletion.status).join(
+        series, days_diff >= 1
+    ).outerjoin(
+        TaskCompletion,
+        and_(
+            TaskCompletion.task_id == Task.id,
+            TaskCompletion.date == occurrence_date
+        )
+    ).filter(
+        Task.user_id == user_id,
+        Task.is_repeatable == True,
+        Task.status == TaskStatus.ACTIVE,
+        Task.date_scheduled < end_date,
+        _within_repeat_window(days_diff)
+    ).order_by(series.c.n, Task.id).all()
+
+    occurrences = []
+    for task, offset, completion_status in rows:
+        target_date = start_date + timedelta(days=offset)
+        occurrences.append(Occurrence.from_task(
+            task,
+            target_date,
+            completion_status or TaskStatus.ACTIVE,
+            (target_date - task.date_scheduled).days + 1
+        ))
+    return occurrences
+
+
+def overlay_completions(tasks, completion_map):
+    """
+    Aplica o status de TaskCompletion às tarefas repetíveis reais do dia de início.
+    completion_map: {(task_id, date): status}. Tarefas sem conclusão voltam sem alteração.
+    """
+    result = []
+    for task in tasks:
+        status = completion_map.get((task.id, task.date_scheduled))
+        if task.is_repeatable and status is not None:
+            result.append(Occurrence.from_task(task, task.date_scheduled, status, 1))
+        else:
+            result.append(task)
+    return result
+
+
+def get_completion_map(user_id, start_date, end_date=None):
+    """Retorna {(task_id, date): status} das conclusões do usuário no intervalo"""
+    end_date = end_date or start_date
+    rows = db.session.query(
+        TaskCompletion.task_id, TaskCompletion.date, TaskCompletion.status
+    ).filter(
+        TaskCompletion.user_id == user_id,
+        TaskCompletion.date >= start_date,
+        TaskCompletion.date <= end_date
+    ).all()
+    return {(task_id, day): status for task_id, day, status in rows}
+
+
+
+def pending_occurrences(user_id, start_date, end_date, after=None, limit=100):
+    """
+    Pares (tarefa, data) não resolvidos no intervalo, para a revisão de pendências.
+
+    Para cada data: tarefas ACTIVE/PENDING_REVIEW normais agendadas nela e
+    repetíveis iniciadas até ela (dentro de repeat_days), sem TaskCompletion
+    DONE/SKIPPED naquela data (anti-join). Ordenado por (data, task_id);
+    after = (data, task_id) do último item já retornado (cursor).
+    Retorna lista de (Task, date) com no máximo `limit` itens (None = sem limite).
+    """
+    series = _day_series((end_date - start_date).days)
+    occurrence_date, days_diff = _series_columns(start_date, series)
+
+    query = db.session.query(Task, series.c.n).join(
+        series, days_diff >= 0
+    ).outerjoin(
+        TaskCompletion,
+        and_(
+            TaskCompletion.task_id == Task.id,
+            TaskCompletion.date == occurrence_date,
+            TaskCompletion.status.in_([TaskStatus.DONE, TaskStatus.SKIPPED])
+        )
+    ).filter(
+        Task.user_id == user_id,
+        Task.status.in_([TaskStatus.PENDING_REVIEW, TaskStatus.ACTIVE]),
+        Task.date_scheduled <= end_date,
+        or_(
+            and_(Task.is_repeatable == False, days_diff == 0),
+            and_(Task.is_repeatable == True, _within_repeat_window(days_diff))
+        ),
+        TaskCompletion.id.is_(None)
+    )
+
+    if after is not None:
+        after_date, after_task_id = after
+        after_offset = (after_date - start_date).days
+        query = query.filter(or_(
+            series.c.n > after_offset,
+            and_(series.c.n == after_offset, Task.id > after_task_id)
+        ))
+
+    query = query.order_by(series.c.n, Task.id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    rows = query.all()
+    return [(task, start_date + timedelta(days=offset)) for task, offset in rows]
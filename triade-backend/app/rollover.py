@@ -0,0 +1,111 @@
+"""
+Rollover - Virada de dia por fuso horário
+
+Cada usuário tem um fuso (users.timezone). Em vez de um único job global à
+meia-noite do servidor, o scheduler verifica a cada 15 minutos quais fusos
+já passaram da meia-noite local e ainda não foram processados
+(rollover_state) e roda os jobs de virada só para esses usuários,
+agrupados por deslocamento UTC. A carga fica espalhada ao longo do dia e
+cada usuário vira o dia na sua própria meia-noite.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import text, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import User, RolloverState, DEFAULT_TIMEZONE
+
+# Dias atrasados recuperados por fuso (ex.: servidor fora do ar)
+MAX_CATCH_UP_DAYS = 7
+
+
+def init_user_timezones():
+    """Adiciona users.timezone em bancos criados antes do fuso por usuário (idempotente)"""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    columns = {row[1] for row in db.session.execute(text("PRAGMA table_info(users)"))}
+    if 'timezone' in columns:
+        return False
+
+    db.session.execute(text(
+        f"ALTER TABLE users ADD COLUMN timezone VARCHAR(50) NOT NULL DEFAULT '{DEFAULT_TIMEZONE}'"
+    ))
+    db.session.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_user_timezone ON users (timezone, id)"
+    ))
+    db.session.commit()
+    return True
+
+
+def due_shards(now_utc=None):
+    """
+    Fusos cuja meia-noite local já passou e ainda não foram virados.
+    Retorna lista de (offset_minutos, [fusos], [dias locais a virar]),
+    dos fusos mais a leste (que viram primeiro) para os mais a oeste.
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    zones = db.session.execute(select(User.timezone).distinct()).scalars().all()
+    last_dates = dict(db.session.query(RolloverState.timezone, RolloverState.last_local_date).all())
+
+    shards = defaultdict(list)
+    for name in zones:
+        try:
+            local_now = now_utc.astimezone(ZoneInfo(name))
+        except (ZoneInfoNotFoundError, ValueError):
+            print(f"[ROLLOVER] Fuso inválido ignorado: {name}")
+            continue
+
+        local_today = local_now.date()
+        last_date = last_dates.get(name)
+        if last_date is not None and last_date >= local_today:
+            continue
+
+        first_day = local_today
+        if last_date is not None:
+            first_day = max(last_date + timedelta(days=1), local_today - timedelta(days=MAX_CATCH_UP_DAYS - 1))
+        days = tuple(first_day + timedelta(days=n) for n in range((local_today - first_day).days + 1))
+
+        offset = int(local_now.utcoffset().total_seconds() // 60)
+        shards[(offset, days)].append(name)
+
+    return [
+        (offset, sorted(names), list(days))
+        for (offset, days), names in sorted(shards.items(), key=lambda item: -item[0][0])
+    ]
+
+
+def mark_rolled_over(timezones, local_date):
+    """Registra que os fusos já viraram até local_date (commit fica com quem chama)"""
+    now = datetime.utcnow()
+    for name in timezones:
+        statement = sqlite_insert(RolloverState).values(
+            timezone=name, last_local_date=local_date, updated_at=now
+        )
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[RolloverState.timezone],
+            set_={'last_local_date': local_date, 'updated_at': now}
+        ))
+
+
+def late_timezones(now_utc=None, grace_minutes=30):
+    """
+    Fusos que passaram da meia-noite local há mais de grace_minutes e ainda
+    não viraram o dia (janela perdida). Retorna [{timezone, local_date, pending_days}].
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    late = []
+    for offset, names, days in due_shards(now_utc):
+        for name in names:
+            local_now = now_utc.astimezone(ZoneInfo(name))
+            midnight = datetime.combine(local_now.date(), datetime.min.time(), tzinfo=local_now.tzinfo)
+            if len(days) > 1 or local_now - midnight > timedelta(minutes=grace_minutes):
+                late.append({
+                    'timezone': name,
+                    'local_date': local_now.date().isoformat(),
+                    'pending_days': [day.isoformat() for day in days]
+                })
+    return late
@@ -0,0 +1,183 @@
+"""
+Rollup - Minutos concluídos por dia e nível de energia
+
+Mantém a tabela energy_rollups (user_id, date, energy_level, minutes) na
+mesma transação das mutações de tarefas, para que o dashboard seja uma
+soma sobre no máximo 31 x 3 linhas em vez de recalcular todas as tarefas.
+
+Contribuição de uma tarefa:
+- Normal (não repetível) DONE com completed_at -> dia do completed_at
+- Repetível -> cada TaskCompletion DONE, no dia da conclusão
+
+Uso nas rotas:
+    before = task_contributions(task)
+    ... altera a tarefa / conclusões ...
+    sync_task_rollup(task, before)
+    db.session.commit()
+"""
+
+from collections import Counter
+from sqlalchemy import select, func, cast, type_coerce, literal, Integer, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import Task, TaskCompletion, TaskStatus, EnergyRollup
+
+
+def task_contributions(task, on_date=None):
+    """
+    Retorna Counter {(date, energy_level): minutes} da tarefa no estado atual da sessão.
+    on_date restringe as conclusões de repetíveis a um único dia (toggle/skip).
+    """
+    contributions = Counter()
+
+    if not task.is_repeatable:
+        if task.status == TaskStatus.DONE and task.completed_at:
+            contributions[(task.completed_at.date(), task.energy_level)] += task.duration_minutes
+        return contributions
+
+    query = db.session.query(TaskCompletion.date).filter(
+        TaskCompletion.task_id == task.id,
+        TaskCompletion.status == TaskStatus.DONE
+    )
+    if on_date is not None:
+        query = query.filter(TaskCompletion.date == on_date)
+
+    for (day,) in query.all():
+        contributions[(day, task.energy_level)] += task.duration_minutes
+    return contributions
+
+
+def sync_task_rollup(task, before, on_date=None):
+    """Aplica ao rollup a diferença entre a contribuição anterior e a atual da tarefa"""
+    delta = task_contributions(task, on_date)
+    delta.subtract(before)
+    apply_rollup_delta(task.user_id, delta)
+
+
+def remove_task_from_rollup(task):
+    """Retira do rollup toda a contribuição da tarefa (antes de excluí-la)"""
+    delta = Counter()
+    delta.subtract(task_contributions(task))
+    apply_rollup_delta(task.user_id, delta)
+
+
+def apply_rollup_delta(user_id, delta):
+    """Soma (ou subtrai) minutos no rollup: delta = {(date, energy_level): minutes}"""
+    for (day, energy_level), minutes in delta.items():
+        if not minutes:
+            continue
+        _upsert(user_id, day, energy_level, minutes)
+
+
+def _upsert(user_id, day, energy_level, minutes):
+    statement = sqlite_insert(EnergyRollup).values(
+        user_id=user_id,
+        date=day,
+        energy_level=energy_level,
+        minutes=minutes
+    )
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['user_id', 'date', 'energy_level'],
+        set_={'minutes': EnergyRollup.minutes + statement.excluded.minutes}
+    ))
+
+
+def _aggregate_contributions(*criteria):
+    """Contribuições agregadas (user_id, date, energy_level, minutes) das tarefas que atendem criteria"""
+    completed_day = type_coerce(func.date(Task.completed_at), db.Date)
+    normal = select(
+        Task.user_id, completed_day, Task.energy_level, func.sum(Task.duration_minutes)
+    ).where(
+        Task.is_repeatable == False,
+        Task.status == TaskStatus.DONE,
+        Task.completed_at.isnot(None),
+        *criteria
+    ).group_by(Task.user_id, completed_day, Task.energy_level)
+
+    repeated = select(
+        Task.user_id, TaskCompletion.date, Task.energy_level, func.sum(Task.duration_minutes)
+    ).join(
+        TaskCompletion, TaskCompletion.task_id == Task.id
+    ).where(
+        Task.is_repeatable == True,
+        TaskCompletion.status == TaskStatus.DONE,
+        *criteria
+    ).group_by(Task.user_id, TaskCompletion.date, Task.energy_level)
+
+    rows = db.session.execute(normal).all() + db.session.execute(repeated).all()
+    return [row for row in rows if row[0] is not None]
+
+
+def subtract_tasks_from_rollup(*criteria):
+    """Remove do rollup a contribuição das tarefas que serão apagadas em lote"""
+    for user_id, day, energy_level, minutes in _aggregate_contributions(*criteria):
+        _upsert(user_id, day, energy_level, -minutes)
+
+
+def rebuild_energy_rollup():
+    """Recalcula todo o rollup a partir das tarefas e conclusões (não faz commit)"""
+    db.session.query(EnergyRollup).delete()
+
+    totals = Counter()
+    for user_id, day, energy_level, minutes in _aggregate_contributions():
+        totals[(user_id, day, energy_level)] += minutes
+
+    db.session.bulk_insert_mappings(EnergyRollup, [
+        {'user_id': user_id, 'date': day, 'energy_level': energy_level, 'minutes': minutes}
+        for (user_id, day, energy_level), minutes in totals.items()
+    ])
+
+
+def init_energy_rollup():
+    """Popula o rollup na primeira execução (tabela vazia com tarefas já concluídas)"""
+    if db.session.query(EnergyRollup.id).first() is not None:
+        return
+    rebuild_energy_rollup()
+    db.session.commit()
+
+
+def sum_energy_minutes(user_id, start_date, end_date):
+    """Retorna {EnergyLevel: minutes} concluídos no intervalo [start_date, end_date]"""
+    rows = db.session.query(
+        EnergyRollup.energy_level, func.sum(EnergyRollup.minutes)
+    ).filter(
+        EnergyRollup.user_id == user_id,
+        EnergyRollup.date >= start_date,
+        EnergyRollup.date <= end_date
+    ).group_by(EnergyRollup.energy_level).all()
+    return {energy_level: minutes or 0 for energy_level, minutes in rows}
+
+
+def _bucket_start_expression(bucket):
+    """Expressão SQL com o primeiro dia do bucket (week começa na segunda-feira)"""
+    if bucket == 'day':
+        return EnergyRollup.date
+    if bucket == 'week':
+        weekday = (cast(func.strftime('%w', EnergyRollup.date), Integer) + 6) % 7
+        return type_coerce(
+            func.date(EnergyRollup.date, literal('-').concat(cast(weekday, String)).concat(' days')),
+            db.Date
+        )
+    if bucket == 'month':
+        return type_coerce(func.strftime('%Y-%m-01', EnergyRollup.date), db.Date)
+    if bucket == 'year':
+        return type_coerce(func.strftime('%Y-01-01', EnergyRollup.date), db.Date)
+    raise ValueError(f'Bucket inválido: {bucket}')
+
+
+def sum_energy_minutes_by_bucket(user_id, start_date, end_date, bucket):
+    """Retorna {bucket_start: {EnergyLevel: minutes}} no intervalo, agregado no SQL"""
+    bucket_start = _bucket_start_expression(bucket).label('bucket_start')
+    rows = db.session.query(
+        bucket_start, EnergyRollup.energy_level, func.sum(EnergyRollup.minutes)
+    ).filter(
+        EnergyRollup.user_id == user_id,
+        EnergyRollup.date >= start_date,
+        EnergyRollup.date <= end_date
+    ).group_by(bucket_start, EnergyRollup.energy_level).all()
+
+    result = {}
+    for day, energy_level, minutes in rows:
+        result.setdefault(day, {})[energy_level] = minutes or 0
+    return result
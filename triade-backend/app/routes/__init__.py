@@ -7,6 +7,8 @@ Organização modular das rotas por domínio:
 - config: Configurações diárias
 - backup: Backup e restauração
 - health: Health check e utilitários
+- sync: Sincronização incremental (change log)
+- admin: Métricas operacionais (job runs)
 """
 
 from flask import Blueprint
@@ -20,3 +22,5 @@ from app.routes import dashboard
 from app.routes import config
 from app.routes import backup
 from app.routes import health
+from app.routes import sync
+from app.routes import admin
@@ -0,0 +1,63 @@
+"""
+Admin Routes - Métricas operacionais (exigem X-Admin-Token)
+
+Endpoints:
+- GET /admin/job-runs - Execuções de jobs (filtros job, status; paginação por before_id)
+- GET /admin/job-runs/summary - Métricas por job na janela (days) + fusos atrasados
+"""
+
+from datetime import datetime, timedelta
+from flask import request, jsonify
+from app.routes import api_bp
+from app.models import JobRun
+from app.job_runs import summarize_job_runs
+from app.rollover import late_timezones
+from app.auth import admin_required
+
+MAX_JOB_RUNS_LIMIT = 200
+MAX_SUMMARY_DAYS = 90
+
+
+@api_bp.route('/admin/job-runs', methods=['GET'])
+@admin_required
+def list_job_runs():
+    """Execuções mais recentes primeiro"""
+    limit = min(max(request.args.get('limit', 50, type=int), 1), MAX_JOB_RUNS_LIMIT)
+    before_id = request.args.get('before_id', type=int)
+
+    try:
+        query = JobRun.query
+        if request.args.get('job'):
+            query = query.filter(JobRun.job == request.args['job'])
+        if request.args.get('status'):
+            query = query.filter(JobRun.status == request.args['status'])
+        if before_id:
+            query = query.filter(JobRun.id < before_id)
+
+        runs = query.order_by(JobRun.id.desc()).limit(limit + 1).all()
+        has_next = len(runs) > limit
+        runs = runs[:limit]
+
+        return jsonify({
+            'job_runs': [run.to_dict() for run in runs],
+            'next_before_id': runs[-1].id if has_next else None
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route('/admin/job-runs/summary', methods=['GET'])
+@admin_required
+def job_runs_summary():
+    """Contagem, falhas, duração média/p95/máx e espera por lock de cada job"""
+    days = min(max(request.args.get('days', 7, type=int), 1), MAX_SUMMARY_DAYS)
+
+    try:
+        since = datetime.utcnow() - timedelta(days=days)
+        return jsonify({
+            'since': since.isoformat(),
+            'jobs': summarize_job_runs(since),
+            'late_timezones': late_timezones()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
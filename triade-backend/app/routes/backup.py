@@ -1,44 +1,75 @@
 """
 Backup Routes - Backup e restauração do banco de dados
 
+Todas as rotas exigem X-Admin-Token.
+
 Endpoints:
-- POST /backup/create - Criar backup
+- POST /backup/create - Enfileirar backup (retorna job_id)
+- GET /backup/jobs/<job_id> - Status, tamanho e throughput do backup
 - GET /backup/list - Listar backups
-- POST /backup/restore - Restaurar backup
+- POST /backup/restore - Restaurar backup (a quente, sem reiniciar o servidor)
+- GET /backup/<name>/download - Baixar backup em streaming (Range, X-Checksum-SHA256)
+- PUT /backup/<name>/upload - Enviar banco em streaming para restaurar depois
 """
 
-from flask import request, jsonify
+from flask import request, jsonify, Response, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
 from app.routes import api_bp
-from app.backup import backup_database, restore_backup, list_backups
+from app.auth import admin_required
+from app.backup import (
+    start_backup_job, get_backup_job, restore_backup, list_backups, storage_usage,
+    open_backup_download, iter_backup_bytes, receive_backup_upload,
+    InvalidBackupUpload, BackupUploadTooLarge
+)
+
+CHECKSUM_HEADER = 'X-Checksum-SHA256'
 
 
 @api_bp.route('/backup/create', methods=['POST'])
+@admin_required
 def create_backup():
-    """Criar backup manual do banco de dados"""
+    """Enfileira backup online do banco de dados (roda em background)"""
     try:
-        backup_path = backup_database()
+        job_id = start_backup_job()
         return jsonify({
-            'message': 'Backup criado com sucesso',
-            'backup_file': backup_path
-        }), 200
+            'message': 'Backup iniciado',
+            'job_id': job_id,
+            'status_url': f'/backup/jobs/{job_id}'
+        }), 202
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route('/backup/jobs/<int:job_id>', methods=['GET'])
+@admin_required
+def get_backup_status(job_id):
+    """Status do backup: queued, running (com progresso), success ou failed"""
+    try:
+        job = get_backup_job(job_id)
+        if not job:
+            return jsonify({'error': 'Job de backup não encontrado'}), 404
+        return jsonify(job), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @api_bp.route('/backup/list', methods=['GET'])
+@admin_required
 def list_available_backups():
-    """Listar backups disponíveis"""
+    """Listar backups disponíveis e o espaço dos snapshots (deduplicação)"""
     try:
         backups = list_backups()
         return jsonify({
             'total': len(backups),
-            'backups': backups
+            'backups': backups,
+            'snapshot_storage': storage_usage()
         }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @api_bp.route('/backup/restore', methods=['POST'])
+@admin_required
 def restore_from_backup():
     """Restaurar banco de um backup específico"""
     data = request.get_json()
@@ -48,8 +79,80 @@ def restore_from_backup():
     
     try:
         result = restore_backup(data['filename'])
-        return jsonify(result), 200
+        return jsonify(result), 200 if result['success'] else 409
     except FileNotFoundError as e:
         return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route('/backup/<name>/download', methods=['GET'])
+@admin_required
+def download_backup(name):
+    """Envia o backup em pedaços (snapshots são remontados durante o envio)"""
+    try:
+        download = open_backup_download(name)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    size = download['size']
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f"attachment; filename={download['filename']}",
+        CHECKSUM_HEADER: download['sha256']
+    }
+
+    if request.if_none_match.contains(download['sha256']):
+        response = Response(status=304, headers=headers)
+        response.set_etag(download['sha256'])
+        return response
+
+    start, stop, status = 0, size, 200
+    # If-Range com outro ETag: o arquivo mudou, envia inteiro
+    if_range = request.if_range
+    if request.range and (if_range.etag is None and if_range.date is None or if_range.etag == download['sha256']):
+        byte_range = request.range.range_for_length(size)
+        if byte_range is None:
+            return Response(status=416, headers={'Content-Range': f'bytes */{size}'})
+        start, stop = byte_range
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+    headers['Content-Length'] = str(stop - start)
+    response = Response(
+        iter_backup_bytes(download, start, stop),
+        status=status,
+        headers=headers,
+        mimetype='application/vnd.sqlite3',
+        direct_passthrough=True
+    )
+    response.set_etag(download['sha256'])
+    return response
+
+
+@api_bp.route('/backup/<name>/upload', methods=['PUT'])
+@admin_required
+def upload_backup(name):
+    """Grava o corpo do request (banco SQLite) em backups/<name>.db, sem bufferizar"""
+    # O MAX_CONTENT_LENGTH global (fotos) não vale aqui: o limite é o de backups
+    max_bytes = current_app.config['BACKUP_MAX_UPLOAD_MB'] * 1024 * 1024
+    request.max_content_length = max_bytes
+    try:
+        result = receive_backup_upload(name, request.stream, request.headers.get(CHECKSUM_HEADER))
+        return jsonify({
+            'message': 'Backup recebido',
+            'backup': result,
+            'restore': {'filename': result['filename']}
+        }), 201
+    except BackupUploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Backup maior que {max_bytes // (1024 * 1024)} MB'}), 413
+    except InvalidBackupUpload as e:
+        return jsonify({'error': str(e)}), 400
+    except FileExistsError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
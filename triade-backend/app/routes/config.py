@@ -4,6 +4,7 @@ Config Routes - Configurações diárias
 Endpoints:
 - GET /config/daily - Obter horas disponíveis do dia
 - POST /config/daily - Definir horas disponíveis do dia
+- GET /capacity - Horas disponíveis, ocupadas e restantes por dia
 """
 
 from flask import request, jsonify
@@ -11,6 +12,7 @@ from datetime import datetime
 from app import db
 from app.routes import api_bp
 from app.models import DailyConfig
+from app.capacity import DEFAULT_AVAILABLE_HOURS, get_capacity_map, get_used_minutes_map
 from app.auth import token_required
 
 
@@ -73,8 +75,49 @@ def get_daily_config(current_user):
     if not config:
         return jsonify({
             'date': date_str,
-            'available_hours': 8.0,
+            'available_hours': DEFAULT_AVAILABLE_HOURS,
             'is_default': True
         }), 200
 
     return jsonify(config.to_dict()), 200
+
+
+MAX_CAPACITY_DAYS = 366
+
+
+@api_bp.route('/capacity', methods=['GET'])
+@token_required
+def get_capacity(current_user):
+    """Capacidade por dia (disponível, ocupada e restante) a partir do ledger"""
+    start_str = request.args.get('start') or request.args.get('date')
+    end_str = request.args.get('end') or start_str
+
+    if not start_str:
+        return jsonify({'error': 'Parâmetro start (ou date) obrigatório'}), 400
+
+    try:
+        start = datetime.strptime(start_str, '%Y-%m-%d').date()
+        end = datetime.strptime(end_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'date inválido. Use YYYY-MM-DD'}), 400
+
+    if end < start:
+        return jsonify({'error': 'end deve ser maior ou igual a start'}), 400
+
+    if (end - start).days + 1 > MAX_CAPACITY_DAYS:
+        return jsonify({'error': f'Intervalo máximo de {MAX_CAPACITY_DAYS} dias'}), 400
+
+    available = get_capacity_map(current_user.id, start, end)
+    used = get_used_minutes_map(current_user.id, start, end)
+
+    days = []
+    for day, available_hours in available.items():
+        used_hours = round(used[day] / 60, 2)
+        days.append({
+            'date': day.isoformat(),
+            'available_hours': available_hours,
+            'used_hours': used_hours,
+            'remaining_hours': round(available_hours - used_hours, 2)
+        })
+
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'days': days}), 200
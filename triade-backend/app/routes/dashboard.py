@@ -3,12 +3,14 @@ Dashboard Routes - Estatísticas e insights
 
 Endpoints:
 - GET /stats/dashboard - Estatísticas da Tríade com insights
+- GET /stats/timeseries - Distribuição de energia por dia/semana/mês/ano
 """
 
 from flask import request, jsonify
 from datetime import datetime, timedelta
 from app.routes import api_bp
-from app.models import Task, EnergyLevel, TaskStatus, TaskCompletion, get_brazil_time
+from app.models import EnergyLevel, get_brazil_time
+from app.rollup import sum_energy_minutes, sum_energy_minutes_by_bucket
 from app.auth import token_required
 
 
@@ -37,58 +39,17 @@ def get_dashboard_stats(current_user):
             else:
                 end_date = (today.replace(month=today.month + 1, day=1) - timedelta(days=1))
         
-        # Tarefas normais DONE
-        normal_tasks = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.status == TaskStatus.DONE,
-            Task.completed_at.isnot(None),
-            Task.completed_at >= datetime.combine(start_date, datetime.min.time()),
-            Task.completed_at <= datetime.combine(end_date, datetime.max.time()),
-            Task.is_repeatable == False
-        ).all()
-
-        # Tarefas repetíveis
-        repeatable_tasks = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.is_repeatable == True
-        ).all()
-
-        all_done_tasks = list(normal_tasks)
-
-        for rep_task in repeatable_tasks:
-            completions = TaskCompletion.query.filter(
-                TaskCompletion.user_id == current_user.id,
-                TaskCompletion.task_id == rep_task.id,
-                TaskCompletion.status == TaskStatus.DONE,
-                TaskCompletion.date >= start_date,
-                TaskCompletion.date <= end_date
-            ).all()
-
-            for completion in completions:
-                virtual_task = Task(
-                    id=rep_task.id,
-                    title=rep_task.title,
-                    energy_level=rep_task.energy_level,
-                    duration_minutes=rep_task.duration_minutes,
-                    status=TaskStatus.DONE,
-                    date_scheduled=completion.date,
-                    is_repeatable=True
-                )
-                all_done_tasks.append(virtual_task)
+        # Minutos concluídos por nível de energia (rollup incremental)
+        minutes_by_energy = sum_energy_minutes(current_user.id, start_date, end_date)
 
         # Calcular minutos por categoria
-        high_energy_minutes = sum(t.duration_minutes for t in all_done_tasks if t.energy_level == EnergyLevel.HIGH_ENERGY)
-        renewal_minutes = sum(t.duration_minutes for t in all_done_tasks if t.energy_level == EnergyLevel.RENEWAL)
-        low_energy_minutes = sum(t.duration_minutes for t in all_done_tasks if t.energy_level == EnergyLevel.LOW_ENERGY)
+        high_energy_minutes = minutes_by_energy.get(EnergyLevel.HIGH_ENERGY, 0)
+        renewal_minutes = minutes_by_energy.get(EnergyLevel.RENEWAL, 0)
+        low_energy_minutes = minutes_by_energy.get(EnergyLevel.LOW_ENERGY, 0)
 
-        total_minutes = high_energy_minutes + renewal_minutes + low_energy_minutes
-
-        if total_minutes > 0:
-            high_energy_pct = round((high_energy_minutes / total_minutes) * 100, 1)
-            renewal_pct = round((renewal_minutes / total_minutes) * 100, 1)
-            low_energy_pct = round((low_energy_minutes / total_minutes) * 100, 1)
-        else:
-            high_energy_pct = renewal_pct = low_energy_pct = 0.0
+        total_minutes, (high_energy_pct, renewal_pct, low_energy_pct) = _energy_distribution(
+            high_energy_minutes, renewal_minutes, low_energy_minutes
+        )
         
         insight = _calculate_insight(high_energy_pct, renewal_pct, low_energy_pct)
         
@@ -111,6 +72,132 @@ def get_dashboard_stats(current_user):
         return jsonify({'error': str(e)}), 500
 
 
+# ==================== TIME SERIES ====================
+
+TIMESERIES_BUCKETS = ('day', 'week', 'month', 'year')
+MAX_TIMESERIES_BUCKETS = 400
+
+
+@api_bp.route('/stats/timeseries', methods=['GET'])
+@token_required
+def get_energy_timeseries(current_user):
+    """
+    Distribuição de energia por bucket em um intervalo arbitrário.
+    Parâmetros: start, end (YYYY-MM-DD), bucket = day | week | month | year
+    """
+    start_str = request.args.get('start')
+    end_str = request.args.get('end')
+    bucket = request.args.get('bucket', 'week')
+
+    if not start_str or not end_str:
+        return jsonify({'error': 'Parâmetros start e end são obrigatórios'}), 400
+
+    if bucket not in TIMESERIES_BUCKETS:
+        return jsonify({'error': "Parâmetro 'bucket' deve ser 'day', 'week', 'month' ou 'year'"}), 400
+
+    try:
+        start_date = datetime.strptime(start_str, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
+
+    if end_date < start_date:
+        return jsonify({'error': 'end deve ser maior ou igual a start'}), 400
+
+    try:
+        bucket_ranges = _bucket_ranges(start_date, end_date, bucket)
+    except (OverflowError, ValueError):
+        # Buckets que passariam de date.min/date.max (ex.: ano 9999)
+        return jsonify({'error': 'Intervalo de datas fora do suportado'}), 400
+    if len(bucket_ranges) > MAX_TIMESERIES_BUCKETS:
+        return jsonify({'error': f'Máximo de {MAX_TIMESERIES_BUCKETS} buckets por consulta'}), 400
+
+    try:
+        minutes_by_bucket = sum_energy_minutes_by_bucket(current_user.id, start_date, end_date, bucket)
+
+        series = []
+        for bucket_start, bucket_end in bucket_ranges:
+            minutes = minutes_by_bucket.get(bucket_start, {})
+            high_energy_minutes = minutes.get(EnergyLevel.HIGH_ENERGY, 0)
+            renewal_minutes = minutes.get(EnergyLevel.RENEWAL, 0)
+            low_energy_minutes = minutes.get(EnergyLevel.LOW_ENERGY, 0)
+
+            total_minutes, (high_energy_pct, renewal_pct, low_energy_pct) = _energy_distribution(
+                high_energy_minutes, renewal_minutes, low_energy_minutes
+            )
+
+            series.append({
+                'start': max(bucket_start, start_date).isoformat(),
+                'end': min(bucket_end, end_date).isoformat(),
+                'total_minutes_done': total_minutes,
+                'minutes': {
+                    'HIGH_ENERGY': high_energy_minutes,
+                    'RENEWAL': renewal_minutes,
+                    'LOW_ENERGY': low_energy_minutes
+                },
+                'distribution': {
+                    'HIGH_ENERGY': high_energy_pct,
+                    'RENEWAL': renewal_pct,
+                    'LOW_ENERGY': low_energy_pct
+                },
+                'insight': _calculate_insight(high_energy_pct, renewal_pct, low_energy_pct)
+            })
+
+        return jsonify({
+            'bucket': bucket,
+            'date_range': {
+                'start': start_date.isoformat(),
+                'end': end_date.isoformat()
+            },
+            'series': series
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _bucket_ranges(start_date, end_date, bucket):
+    """Lista de (início, fim) de cada bucket que intersecta [start_date, end_date]"""
+    if bucket == 'day':
+        current = start_date
+    elif bucket == 'week':
+        current = start_date - timedelta(days=start_date.weekday())
+    elif bucket == 'month':
+        current = start_date.replace(day=1)
+    else:
+        current = start_date.replace(month=1, day=1)
+
+    ranges = []
+    while current <= end_date:
+        if bucket == 'day':
+            following = current + timedelta(days=1)
+        elif bucket == 'week':
+            following = current + timedelta(days=7)
+        elif bucket == 'month':
+            following = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            following = current.replace(year=current.year + 1)
+        ranges.append((current, following - timedelta(days=1)))
+        current = following
+        if len(ranges) > MAX_TIMESERIES_BUCKETS:
+            break
+    return ranges
+
+
+def _energy_distribution(high_energy_minutes, renewal_minutes, low_energy_minutes):
+    """Retorna (total_minutes, (high_pct, renewal_pct, low_pct))"""
+    total_minutes = high_energy_minutes + renewal_minutes + low_energy_minutes
+
+    if total_minutes > 0:
+        high_energy_pct = round((high_energy_minutes / total_minutes) * 100, 1)
+        renewal_pct = round((renewal_minutes / total_minutes) * 100, 1)
+        low_energy_pct = round((low_energy_minutes / total_minutes) * 100, 1)
+    else:
+        high_energy_pct = renewal_pct = low_energy_pct = 0.0
+
+    return total_minutes, (high_energy_pct, renewal_pct, low_energy_pct)
+
+
 def _calculate_insight(high_energy_pct, renewal_pct, low_energy_pct):
     """
     Calcula o insight baseado nas porcentagens dos Níveis de Energia.
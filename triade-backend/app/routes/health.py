@@ -3,11 +3,15 @@ Health Routes - Health check e utilitários de debug
 
 Endpoints:
 - GET /health - Verificar status da API
+- GET /health/auth-cache - Contadores do cache de autenticação (X-Admin-Token)
+- GET /health/storage - Perfil e PRAGMAs do SQLite em vigor (X-Admin-Token)
+- GET /health/group-commit - Lotes do group commit (deste processo, X-Admin-Token)
 - POST /test/midnight-job - Testar job de meia-noite (debug)
 """
 
 from flask import jsonify
 from app.routes import api_bp
+from app.auth import admin_required
 from app.models import get_brazil_time
 
 
@@ -21,6 +25,37 @@ def health_check():
     }), 200
 
 
+@api_bp.route('/health/auth-cache', methods=['GET'])
+@admin_required
+def auth_cache_stats():
+    """Hits/misses/evictions do cache de usuário autenticado (deste processo)"""
+    from app.auth.cache import principal_cache
+    return jsonify(principal_cache.stats()), 200
+
+
+@api_bp.route('/health/storage', methods=['GET'])
+@admin_required
+def storage_profile():
+    """Perfil do SQLite e os PRAGMAs efetivamente aplicados nas conexões"""
+    from flask import current_app
+    from app.storage import current_pragmas
+    try:
+        return jsonify({
+            'profile': current_app.config.get('SQLITE_PROFILE'),
+            'pragmas': current_pragmas()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route('/health/group-commit', methods=['GET'])
+@admin_required
+def group_commit_stats():
+    """Lotes, operações e tamanho médio do lote do group commit (deste processo)"""
+    from app.group_commit import group_commit
+    return jsonify(group_commit.stats()), 200
+
+
 @api_bp.route('/test/midnight-job', methods=['POST'])
 def test_midnight_job():
     """APENAS TESTE - Remove em produção"""
@@ -0,0 +1,33 @@
+"""
+Sync Routes - Sincronização incremental
+
+Endpoints:
+- GET /sync?since=<cursor> - Entidades alteradas e excluídas desde o cursor
+"""
+
+from flask import request, jsonify
+from app.routes import api_bp
+from app.sync import snapshot, changes_since, SyncCursorExpired
+from app.auth import token_required
+
+
+@api_bp.route('/sync', methods=['GET'])
+@token_required
+def sync_changes(current_user):
+    """
+    Sem since (ou since=0): estado completo + cursor atual.
+    Com since: apenas tarefas, conclusões e configs alteradas, e ids excluídos.
+    Repita com o cursor retornado enquanto has_more for true.
+    Cursor mais antigo que o horizonte do log: 410, refazer com since=0.
+    """
+    since = request.args.get('since', 0, type=int)
+    limit = min(max(request.args.get('limit', 1000, type=int), 1), 5000)
+
+    try:
+        if since <= 0:
+            return jsonify(snapshot(current_user.id)), 200
+        return jsonify(changes_since(current_user.id, since, limit)), 200
+    except SyncCursorExpired as e:
+        return jsonify({'error': str(e), 'horizon': e.horizon, 'resync': True}), 410
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
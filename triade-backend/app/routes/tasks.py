@@ -3,27 +3,52 @@ Tasks Routes - CRUD e operações de tarefas
 
 Endpoints:
 - GET /tasks/daily - Listar tarefas do dia
+- GET /tasks/range - Visão diária de um intervalo de datas
 - POST /tasks - Criar tarefa
 - PUT /tasks/<id> - Atualizar tarefa
 - DELETE /tasks/<id> - Excluir tarefa
+- POST /tasks/batch - Criar/editar/excluir/alternar várias tarefas em uma transação
 - POST /tasks/<id>/toggle-date - Toggle status por data
 - GET /tasks/pending_review - Tarefas pendentes de revisão
+- GET /tasks/pending_review/backlog - Pendências de um intervalo de datas
 - GET /tasks/delegated - Tarefas delegadas
 - GET /tasks/weekly - Tarefas da semana
 - GET /tasks/history - Histórico de tarefas
+- GET /tasks/search - Busca textual de tarefas
 - POST /tasks/cleanup - Limpar tarefas antigas
 """
 
 from flask import request, jsonify
+import base64
+import time
 from datetime import datetime, timedelta
 from app import db
 from app.routes import api_bp
-from app.models import Task, DailyConfig, EnergyLevel, TaskStatus, TaskCompletion, get_brazil_time
-from app.utils import validate_timebox, get_available_hours, get_energy_level_order_value
+from app.models import Task, EnergyLevel, TaskStatus, TaskCompletion, get_brazil_time
+from app.utils import validate_timebox, get_energy_level_order_value
+from app.capacity import (
+    get_capacity_map, get_used_minutes_map, task_capacity_contributions, sync_task_capacity,
+    subtract_tasks_from_capacity
+)
+from app.history import fetch_history, count_history, encode_cursor, decode_cursor, InvalidCursor
+from app.search import search_tasks
+from app.rollup import task_contributions, sync_task_rollup, remove_task_from_rollup, subtract_tasks_from_rollup
+from app.recurrence import expand_occurrences, overlay_completions, get_completion_map, pending_occurrences
+from app.job_runs import record_job_run, acquire_write_lock
+from app.group_commit import group_commit, GroupCommitTimeout
 from app.auth import token_required
 from sqlalchemy import or_
 
 
+class TaskOperationError(Exception):
+    """Erro de validação em uma operação de tarefa (payload JSON + status HTTP)"""
+
+    def __init__(self, payload, status_code=400):
+        super().__init__(payload.get('error'))
+        self.payload = payload
+        self.status_code = status_code
+
+
 # ==================== DAILY TASKS ====================
 
 @api_bp.route('/tasks/daily', methods=['GET'])
@@ -35,88 +60,89 @@ def get_daily_tasks(current_user):
 
     try:
         target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        day_view = _build_daily_views(current_user.id, target_date, target_date)[0]
 
-        # 1. Buscar tarefas REAIS agendadas para hoje
-        real_tasks = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.date_scheduled == target_date
-        ).all()
+        return jsonify({
+            'date': date_str,
+            'tasks': day_view['tasks'],
+            'summary': day_view['summary']
+        }), 200
 
-        # 2. Buscar tarefas REPETÍVEIS (Active) que começaram antes de hoje
-        repeatable_candidates = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.is_repeatable == True,
-            Task.date_scheduled < target_date,
-            Task.status == TaskStatus.ACTIVE
-        ).all()
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # 3. Buscar conclusões salvas para este dia específico
-        completions = TaskCompletion.query.filter(
-            TaskCompletion.user_id == current_user.id,
-            TaskCompletion.date == target_date
-        ).all()
-        completion_map = {c.task_id: c.status for c in completions}
-
-        # Aplicar conclusões às real_tasks repetíveis
-        processed_real_tasks = []
-        for task in real_tasks:
-            if task.is_repeatable and task.id in completion_map:
-                processed_task = Task(
-                    id=task.id,
-                    title=task.title,
-                    description=task.description,
-                    energy_level=task.energy_level, 
-                    duration_minutes=task.duration_minutes,
-                    status=completion_map[task.id],
-                    date_scheduled=task.date_scheduled,
-                    scheduled_time=task.scheduled_time,
-                    role_tag=task.role_tag,
-                    context_tag=task.context_tag,
-                    delegated_to=task.delegated_to,
-                    is_repeatable=task.is_repeatable,
-                    repeat_count=1,
-                    repeat_days=task.repeat_days,
-                    created_at=task.created_at,
-                    updated_at=get_brazil_time()
-                )
-                processed_real_tasks.append(processed_task)
-            else:
-                processed_real_tasks.append(task)
-
-        # Criar tarefas virtuais para repetíveis
-        virtual_tasks = []
-        for rep_task in repeatable_candidates:
-            days_diff = (target_date - rep_task.date_scheduled).days
-
-            if rep_task.repeat_days and rep_task.repeat_days > 0:
-                if days_diff >= rep_task.repeat_days:
-                    continue
-
-            current_status = completion_map.get(rep_task.id, TaskStatus.ACTIVE)
-
-            virtual_task = Task(
-                id=rep_task.id,
-                title=rep_task.title,
-                description=rep_task.description,
-                energy_level=rep_task.energy_level,
-                duration_minutes=rep_task.duration_minutes,
-                status=current_status,
-                date_scheduled=target_date,
-                scheduled_time=rep_task.scheduled_time,
-                role_tag=rep_task.role_tag,
-                context_tag=rep_task.context_tag,
-                delegated_to=rep_task.delegated_to,
-                is_repeatable=True,
-                repeat_count=days_diff + 1,
-                repeat_days=rep_task.repeat_days,
-                created_at=rep_task.created_at,
-                updated_at=get_brazil_time()
-            )
-            virtual_tasks.append(virtual_task)
 
-        all_tasks = processed_real_tasks + virtual_tasks
+# ==================== RANGE (MULTI-DAY) ====================
+
+MAX_RANGE_DAYS = 366
+
+
+@api_bp.route('/tasks/range', methods=['GET'])
+@token_required
+def get_range_tasks(current_user):
+    """Visão diária completa (tarefas, repetíveis, conclusões e resumo) para cada dia do intervalo"""
+    start_str = request.args.get('start')
+    end_str = request.args.get('end')
+
+    if not start_str or not end_str:
+        return jsonify({'error': 'Parâmetros start e end são obrigatórios'}), 400
+
+    try:
+        start = datetime.strptime(start_str, '%Y-%m-%d').date()
+        end = datetime.strptime(end_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
+
+    if end < start:
+        return jsonify({'error': 'end deve ser maior ou igual a start'}), 400
+
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        return jsonify({'error': f'Intervalo máximo de {MAX_RANGE_DAYS} dias'}), 400
+
+    try:
+        return jsonify({
+            'start': start_str,
+            'end': end_str,
+            'days': _build_daily_views(current_user.id, start, end)
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _build_daily_views(user_id, start, end):
+    """
+    Monta a visão diária de cada data em [start, end] com um número fixo de queries:
+    tarefas reais, conclusões, expansão das repetíveis e configs do intervalo.
+    """
+    # 1. Tarefas REAIS agendadas no intervalo
+    real_tasks = Task.query.filter(
+        Task.user_id == user_id,
+        Task.date_scheduled >= start,
+        Task.date_scheduled <= end
+    ).all()
+
+    # 2. Conclusões do intervalo (sobrepostas às repetíveis reais)
+    completion_map = get_completion_map(user_id, start, end)
+
+    tasks_by_day = {}
+    for task in overlay_completions(real_tasks, completion_map):
+        tasks_by_day.setdefault(task.date_scheduled, []).append(task)
+
+    # 3. Ocorrências virtuais das repetíveis que começaram antes de cada dia
+    for occurrence in expand_occurrences(user_id, start, end):
+        tasks_by_day.setdefault(occurrence.date_scheduled, []).append(occurrence)
+
+    # 4. Horas disponíveis de todos os dias em uma query
+    capacity = get_capacity_map(user_id, start, end)
+
+    days = []
+    current_date = start
+    while current_date <= end:
+        day_tasks = tasks_by_day.get(current_date, [])
         tasks_sorted = sorted(
-            all_tasks, 
+            day_tasks,
             key=lambda t: (
                 get_energy_level_order_value(t.energy_level),
                 t.context_tag or 'zzz',
@@ -125,18 +151,17 @@ def get_daily_tasks(current_user):
         )
 
         # Calcular duração (exclui delegadas)
-        my_tasks_duration = [
-            t.duration_minutes for t in all_tasks 
+        total_minutes = sum(
+            t.duration_minutes for t in day_tasks
             if t.delegated_to is None or t.delegated_to == ""
-        ]
-        total_minutes = sum(my_tasks_duration)
+        )
         used_hours = round(total_minutes / 60, 2)
 
-        active_count = len([t for t in all_tasks if t.status == TaskStatus.ACTIVE])
-        available_hours = get_available_hours(target_date)
+        active_count = len([t for t in day_tasks if t.status == TaskStatus.ACTIVE])
+        available_hours = capacity[current_date]
 
-        return jsonify({
-            'date': date_str,
+        days.append({
+            'date': current_date.isoformat(),
             'tasks': [task.to_dict() for task in tasks_sorted],
             'summary': {
                 'total_tasks': active_count,
@@ -144,12 +169,10 @@ def get_daily_tasks(current_user):
                 'available_hours': available_hours,
                 'remaining_hours': round(available_hours - used_hours, 2)
             }
-        }), 200
+        })
+        current_date += timedelta(days=1)
 
-    except ValueError:
-        return jsonify({'error': 'Formato de data inválido'}), 400
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    return days
 
 
 # ==================== TOGGLE TASK STATUS ====================
@@ -164,17 +187,62 @@ def toggle_task_date(current_user, task_id):
         return jsonify({'error': 'Data obrigatória'}), 400
 
     target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+
+    if group_commit.enabled:
+        # Commit em lote com os toques de outros requests (app/group_commit.py)
+        try:
+            new_status = group_commit.submit(_toggle_user_task_date, current_user, task_id, target_date)
+        except TaskOperationError as e:
+            return jsonify(e.payload), e.status_code
+        except GroupCommitTimeout as e:
+            return _group_commit_timeout_response(e, task_id, date_str)
+    else:
+        task = Task.query.filter(
+            Task.id == task_id,
+            Task.user_id == current_user.id
+        ).first_or_404()
+
+        new_status = _toggle_task_date(current_user, task, target_date)
+        db.session.commit()
+
+    return jsonify({'status': new_status.value, 'task_id': task_id, 'date': date_str}), 200
+
+
+def _group_commit_timeout_response(error, task_id, date_str):
+    """
+    503 se a escrita foi cancelada (não aplicada, pode repetir); 202 se já
+    estava em um lote e ainda pode ser aplicada (o cliente deve reler o
+    estado antes de repetir, porque toggle não é idempotente)
+    """
+    payload = {'error': str(error), 'task_id': task_id, 'date': date_str, 'applied': False if error.cancelled else None}
+    return jsonify(payload), 503 if error.cancelled else 202
+
+
+def _get_user_task(current_user, task_id):
+    """Tarefa do usuário ou TaskOperationError 404 (caminho do group commit)"""
     task = Task.query.filter(
         Task.id == task_id,
         Task.user_id == current_user.id
-    ).first_or_404()
+    ).first()
+    if task is None:
+        raise TaskOperationError({'error': 'Tarefa não encontrada'}, 404)
+    return task
 
+
+def _toggle_user_task_date(current_user, task_id, target_date):
+    return _toggle_task_date(current_user, _get_user_task(current_user, task_id), target_date)
+
+
+def _toggle_task_date(current_user, task, target_date):
+    """Alterna a conclusão da tarefa na data (sem commit). Retorna o novo status."""
+    task_id = task.id
     completion = TaskCompletion.query.filter(
         TaskCompletion.user_id == current_user.id,
         TaskCompletion.task_id == task_id, 
         TaskCompletion.date == target_date
     ).first()
 
+    rollup_before = task_contributions(task, target_date)
     new_status = TaskStatus.ACTIVE
 
     if completion:
@@ -202,9 +270,8 @@ def toggle_task_date(current_user, task_id):
             task.status = TaskStatus.DONE
 
     task.updated_at = get_brazil_time()
-    db.session.commit()
-
-    return jsonify({'status': new_status.value, 'task_id': task_id, 'date': date_str}), 200
+    sync_task_rollup(task, rollup_before, target_date)
+    return new_status
 
 
 # ==================== PENDING REVIEW ====================
@@ -224,67 +291,8 @@ def get_pending_review(current_user):
     except ValueError:
         return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
 
-    from sqlalchemy import or_, and_, not_, exists, select
-
-    # Subquery para verificar se existe TaskCompletion (DONE ou SKIPPED) para a tarefa naquela data
-    completion_exists = exists(
-        select(TaskCompletion.id).where(
-            and_(
-                TaskCompletion.task_id == Task.id,
-                TaskCompletion.date == target_date,
-                or_(
-                    TaskCompletion.status == TaskStatus.DONE,
-                    TaskCompletion.status == TaskStatus.SKIPPED
-                )
-            )
-        )
-    )
-
-    # Busca tarefas:
-    # 1. Tarefas normais agendadas exatamente para target_date
-    # 2. Tarefas repetíveis que começaram ANTES de target_date e ainda estão ACTIVE
-    tasks = Task.query.filter(
-        Task.user_id == current_user.id,
-        or_(
-            Task.status == TaskStatus.PENDING_REVIEW,
-            Task.status == TaskStatus.ACTIVE
-        ),
-        or_(
-            # Tarefas normais agendadas para esta data
-            and_(
-                Task.is_repeatable == False,
-                Task.date_scheduled == target_date
-            ),
-            # Tarefas repetíveis que começaram antes ou nesta data
-            and_(
-                Task.is_repeatable == True,
-                Task.date_scheduled <= target_date
-            )
-        ),
-        not_(completion_exists)  # ✅ Exclui tarefas já concluídas via TaskCompletion
-    ).all()
-    
-    # Filtra repetíveis que já passaram do repeat_days
-    filtered_tasks = []
-    for task in tasks:
-        if task.is_repeatable and task.repeat_days:
-            days_diff = (target_date - task.date_scheduled).days
-            if days_diff >= task.repeat_days:
-                continue  # Pula tarefas repetíveis que já expiraram
-        filtered_tasks.append(task)
-    tasks = filtered_tasks
-
-    # ✅ Para tarefas repetíveis, retorna com date_scheduled ajustado para target_date
-    result_tasks = []
-    for task in tasks:
-        task_dict = task.to_dict()
-        if task.is_repeatable and task.date_scheduled != target_date:
-            # Ajusta a data para a data de pendência (cria instância "virtual")
-            task_dict['date_scheduled'] = target_date.isoformat()
-            # Calcula qual número da série seria
-            series_number = (target_date - task.date_scheduled).days + 1
-            task_dict['repeat_count'] = series_number
-        result_tasks.append(task_dict)
+    pending = pending_occurrences(current_user.id, target_date, target_date, limit=None)
+    result_tasks = [_pending_task_dict(task, day) for task, day in pending]
 
     return jsonify({
         'date': date_str,
@@ -293,6 +301,83 @@ def get_pending_review(current_user):
     }), 200
 
 
+MAX_BACKLOG_DAYS = 366
+MAX_BACKLOG_LIMIT = 500
+
+
+@api_bp.route('/tasks/pending_review/backlog', methods=['GET'])
+@token_required
+def get_pending_backlog(current_user):
+    """
+    Todas as pendências (tarefa, data) não resolvidas em um intervalo, em uma única query.
+    Parâmetros: start, end (YYYY-MM-DD), limit (padrão 100), cursor (next_cursor da resposta anterior)
+    """
+    start_str = request.args.get('start')
+    end_str = request.args.get('end')
+    limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_BACKLOG_LIMIT)
+    cursor_param = request.args.get('cursor')
+
+    if not start_str or not end_str:
+        return jsonify({'error': 'Parâmetros start e end são obrigatórios'}), 400
+
+    try:
+        start = datetime.strptime(start_str, '%Y-%m-%d').date()
+        end = datetime.strptime(end_str, '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'Formato de data inválido. Use YYYY-MM-DD'}), 400
+
+    if end < start:
+        return jsonify({'error': 'end deve ser maior ou igual a start'}), 400
+
+    if (end - start).days + 1 > MAX_BACKLOG_DAYS:
+        return jsonify({'error': f'Intervalo máximo de {MAX_BACKLOG_DAYS} dias'}), 400
+
+    after = None
+    if cursor_param:
+        try:
+            raw = base64.urlsafe_b64decode(cursor_param.encode()).decode()
+            after_date, after_task_id = raw.split('|')
+            after = (datetime.strptime(after_date, '%Y-%m-%d').date(), int(after_task_id))
+        except Exception:
+            return jsonify({'error': 'Cursor inválido'}), 400
+
+    try:
+        pending = pending_occurrences(current_user.id, start, end, after=after, limit=limit + 1)
+        has_more = len(pending) > limit
+        pending = pending[:limit]
+
+        next_cursor = None
+        if has_more:
+            last_task, last_day = pending[-1]
+            next_cursor = base64.urlsafe_b64encode(
+                f'{last_day.isoformat()}|{last_task.id}'.encode()
+            ).decode()
+
+        result_tasks = [_pending_task_dict(task, day) for task, day in pending]
+
+        return jsonify({
+            'start': start_str,
+            'end': end_str,
+            'pending_tasks': result_tasks,
+            'count': len(result_tasks),
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def _pending_task_dict(task, day):
+    """Para repetíveis, retorna com date_scheduled ajustado para a data da pendência"""
+    task_dict = task.to_dict()
+    if task.is_repeatable and task.date_scheduled != day:
+        # Ajusta a data para a data de pendência (cria instância "virtual")
+        task_dict['date_scheduled'] = day.isoformat()
+        # Calcula qual número da série seria
+        task_dict['repeat_count'] = (day - task.date_scheduled).days + 1
+    return task_dict
+
+
 @api_bp.route('/tasks/<int:task_id>/skip', methods=['POST'])
 @token_required
 def skip_task_for_date(current_user, task_id):
@@ -304,10 +389,29 @@ def skip_task_for_date(current_user, task_id):
         return jsonify({'error': 'Data obrigatória'}), 400
 
     target_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-    task = Task.query.filter(
-        Task.id == task_id,
-        Task.user_id == current_user.id
-    ).first_or_404()
+
+    if group_commit.enabled:
+        try:
+            group_commit.submit(_skip_user_task_date, current_user, task_id, target_date)
+        except TaskOperationError as e:
+            return jsonify(e.payload), e.status_code
+        except GroupCommitTimeout as e:
+            return _group_commit_timeout_response(e, task_id, date_str)
+    else:
+        task = Task.query.filter(
+            Task.id == task_id,
+            Task.user_id == current_user.id
+        ).first_or_404()
+
+        _skip_task_date(current_user, task, target_date)
+        db.session.commit()
+
+    return jsonify({'status': 'SKIPPED', 'task_id': task_id, 'date': date_str}), 200
+
+
+def _skip_task_date(current_user, task, target_date):
+    """Marca a tarefa como SKIPPED na data (sem commit)"""
+    task_id = task.id
 
     # Verifica se já existe completion para essa data
     existing = TaskCompletion.query.filter(
@@ -316,6 +420,8 @@ def skip_task_for_date(current_user, task_id):
         TaskCompletion.date == target_date
     ).first()
 
+    rollup_before = task_contributions(task, target_date)
+
     if existing:
         # Se já existe, atualiza para SKIPPED
         existing.status = TaskStatus.SKIPPED
@@ -330,9 +436,11 @@ def skip_task_for_date(current_user, task_id):
         db.session.add(completion)
 
     task.updated_at = get_brazil_time()
-    db.session.commit()
+    sync_task_rollup(task, rollup_before, target_date)
 
-    return jsonify({'status': 'SKIPPED', 'task_id': task_id, 'date': date_str}), 200
+
+def _skip_user_task_date(current_user, task_id, target_date):
+    _skip_task_date(current_user, _get_user_task(current_user, task_id), target_date)
 
 # ==================== CREATE TASK ====================
 
@@ -342,31 +450,45 @@ def create_task(current_user):
     """Criar nova tarefa com validação de timebox"""
     data = request.get_json()
 
+    try:
+        task = _create_task(current_user, data)
+    except TaskOperationError as e:
+        return jsonify(e.payload), e.status_code
+
+    db.session.commit()
+
+    return jsonify(task.to_dict()), 201
+
+
+def _create_task(current_user, data, check_timebox=True):
+    """Valida os dados e adiciona a nova tarefa à sessão (sem commit)"""
     required_fields = ['title', 'energy_level', 'duration_minutes', 'date_scheduled']
     for field in required_fields:
         if field not in data:
-            return jsonify({'error': f'Campo obrigatório: {field}'}), 400
+            raise TaskOperationError({'error': f'Campo obrigatório: {field}'})
 
     try:
         energy = EnergyLevel[data['energy_level']]
     except KeyError:
-        return jsonify({'error': 'energy_level inválido. Use: HIGH_ENERGY, LOW_ENERGY ou RENEWAL'}), 400
+        raise TaskOperationError({'error': 'energy_level inválido. Use: HIGH_ENERGY, LOW_ENERGY ou RENEWAL'})
 
     try:
         target_date = datetime.strptime(data['date_scheduled'], '%Y-%m-%d').date()
-    except ValueError:
-        return jsonify({'error': 'date_scheduled inválido. Use YYYY-MM-DD'}), 400
+    except (TypeError, ValueError):
+        raise TaskOperationError({'error': 'date_scheduled inválido. Use YYYY-MM-DD'})
 
-    valid, error_data = validate_timebox(target_date, data['duration_minutes'], current_user.id)
-    if not valid:
-        return jsonify(error_data), 400
+    # Delegadas não ocupam o dia de quem delega
+    if check_timebox and not data.get('delegated_to'):
+        valid, error_data = validate_timebox(target_date, data['duration_minutes'], current_user.id)
+        if not valid:
+            raise TaskOperationError(error_data)
 
     scheduled_time = None
     if data.get('scheduled_time'):
         try:
             scheduled_time = datetime.strptime(data['scheduled_time'], '%H:%M').time()
-        except ValueError:
-            return jsonify({'error': 'scheduled_time inválido. Use HH:MM'}), 400
+        except (TypeError, ValueError):
+            raise TaskOperationError({'error': 'scheduled_time inválido. Use HH:MM'})
 
     task = Task(
         user_id=current_user.id,
@@ -381,7 +503,8 @@ def create_task(current_user):
         delegated_to=data.get('delegated_to', '')[:50] if data.get('delegated_to') else None,
         is_repeatable=data.get('is_repeatable', False),
         repeat_count=data.get('repeat_count', 0),
-        repeat_days=data.get('repeat_days')
+        repeat_days=data.get('repeat_days'),
+        status=TaskStatus.ACTIVE
     )
 
     if task.delegated_to:
@@ -390,13 +513,12 @@ def create_task(current_user):
     if 'follow_up_date' in data and data['follow_up_date']:
         try:
             task.follow_up_date = datetime.strptime(data['follow_up_date'], '%Y-%m-%d').date()
-        except ValueError:
+        except (TypeError, ValueError):
             pass
 
     db.session.add(task)
-    db.session.commit()
-
-    return jsonify(task.to_dict()), 201
+    sync_task_capacity(current_user.id, task_capacity_contributions(None), task)
+    return task
 
 
 # ==================== UPDATE TASK ====================
@@ -410,9 +532,29 @@ def update_task(current_user, task_id):
     ).first_or_404()
     data = request.get_json()
 
+    try:
+        _update_task(current_user, task, data)
+    except TaskOperationError as e:
+        return jsonify(e.payload), e.status_code
+
+    db.session.commit()
+
+    return jsonify({'message': 'Tarefa atualizada', 'task': task.to_dict()})
+
+
+def _update_task(current_user, task, data):
+    """Aplica as alterações de data à tarefa (sem commit)"""
+    task_id = task.id
     was_repeatable = task.is_repeatable
     old_status = task.status
 
+    # Campos que alteram os minutos concluídos no rollup de energia
+    affects_rollup = any(
+        field in data for field in ('status', 'energy_level', 'duration_minutes', 'is_repeatable')
+    )
+    rollup_before = task_contributions(task) if affects_rollup else None
+    capacity_before = task_capacity_contributions(task)
+
     # Campos simples
     if 'title' in data: 
         task.title = data['title'][:40] if data['title'] else data['title']
@@ -430,13 +572,13 @@ def update_task(current_user, task_id):
         try:
             task.energy_level = EnergyLevel[data['energy_level']]
         except KeyError:
-            return jsonify({'error': 'Nível de energia inválido'}), 400
+            raise TaskOperationError({'error': 'Nível de energia inválido'})
 
     if 'date_scheduled' in data:
         try:
             task.date_scheduled = datetime.strptime(data['date_scheduled'], '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Data inválida'}), 400
+        except (TypeError, ValueError):
+            raise TaskOperationError({'error': 'Data inválida'})
 
     # Scheduled Time
     if 'scheduled_time' in data:
@@ -444,8 +586,8 @@ def update_task(current_user, task_id):
         if val:
             try:
                 task.scheduled_time = datetime.strptime(val, '%H:%M').time()
-            except ValueError:
-                return jsonify({'error': 'scheduled_time inválido. Use HH:MM'}), 400
+            except (TypeError, ValueError):
+                raise TaskOperationError({'error': 'scheduled_time inválido. Use HH:MM'})
         else:
             task.scheduled_time = None
 
@@ -462,7 +604,7 @@ def update_task(current_user, task_id):
                 task.completed_at = None
             
         except KeyError:
-            return jsonify({'error': 'Status inválido'}), 400
+            raise TaskOperationError({'error': 'Status inválido'})
 
     # Delegação
     if 'delegated_to' in data:
@@ -480,7 +622,10 @@ def update_task(current_user, task_id):
     # Follow-up
     if 'follow_up_date' in data:
         val = data['follow_up_date']
-        task.follow_up_date = datetime.strptime(val, '%Y-%m-%d').date() if val else None
+        try:
+            task.follow_up_date = datetime.strptime(val, '%Y-%m-%d').date() if val else None
+        except (TypeError, ValueError):
+            raise TaskOperationError({'error': 'follow_up_date inválido. Use YYYY-MM-DD'})
 
     # Repetição
     if 'is_repeatable' in data:
@@ -499,9 +644,10 @@ def update_task(current_user, task_id):
         task.repeat_days = data['repeat_days']
 
     task.updated_at = get_brazil_time()
-    db.session.commit()
-
-    return jsonify({'message': 'Tarefa atualizada', 'task': task.to_dict()})
+    if affects_rollup:
+        sync_task_rollup(task, rollup_before)
+    sync_task_capacity(current_user.id, capacity_before, task)
+    return task
 
 
 # ==================== DELETE TASK ====================
@@ -514,16 +660,172 @@ def delete_task(current_user, task_id):
         Task.id == task_id,
         Task.user_id == current_user.id
     ).first_or_404()
-    
+
+    _delete_task(current_user, task)
+    db.session.commit()
+
+    return jsonify({'message': 'Tarefa excluída com sucesso'}), 200
+
+
+def _delete_task(current_user, task):
+    """Remove a tarefa, suas conclusões e contribuições (sem commit)"""
+    remove_task_from_rollup(task)
+    sync_task_capacity(current_user.id, task_capacity_contributions(task), None)
+
     TaskCompletion.query.filter(
         TaskCompletion.user_id == current_user.id,
-        TaskCompletion.task_id == task_id
+        TaskCompletion.task_id == task.id
     ).delete()
 
     db.session.delete(task)
+
+
+# ==================== BATCH ====================
+
+MAX_BATCH_OPERATIONS = 200
+BATCH_OPERATIONS = ('create', 'update', 'delete', 'toggle')
+
+# Campos de update que podem aumentar as horas ocupadas de um dia
+_CAPACITY_FIELDS = ('date_scheduled', 'duration_minutes', 'delegated_to', 'is_repeatable', 'repeat_days', 'status')
+
+
+@api_bp.route('/tasks/batch', methods=['POST'])
+@token_required
+def batch_tasks(current_user):
+    """
+    Aplica uma lista de operações em uma única transação (tudo ou nada).
+
+    Body: {"operations": [
+        {"op": "create", "data": {...}},
+        {"op": "update", "id": 1, "data": {...}},
+        {"op": "delete", "id": 2},
+        {"op": "toggle", "id": 3, "date": "YYYY-MM-DD"}
+    ]}
+    O timebox é validado uma vez, no final, para todos os dias afetados.
+    Criações e edições vão para o banco juntas, num único flush (INSERT de
+    várias linhas e UPDATEs em executemany).
+    """
+    data = request.get_json() or {}
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'Campo operations obrigatório (lista não vazia)'}), 400
+
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'Máximo de {MAX_BATCH_OPERATIONS} operações por lote'}), 400
+
+    # Carrega de uma vez todas as tarefas referenciadas
+    task_ids = {op.get('id') for op in operations if isinstance(op, dict) and op.get('id') is not None}
+    tasks_by_id = {
+        task.id: task for task in Task.query.filter(
+            Task.user_id == current_user.id,
+            Task.id.in_(task_ids)
+        ).all()
+    } if task_ids else {}
+
+    applied = []
+    affected_days = set()
+
+    # Sem autoflush: as tarefas novas/editadas são gravadas juntas no flush final
+    with db.session.no_autoflush:
+        for index, operation in enumerate(operations):
+            try:
+                applied.append(_apply_batch_operation(current_user, operation, tasks_by_id, affected_days))
+            except TaskOperationError as e:
+                db.session.rollback()
+                return jsonify({
+                    'error': 'Lote rejeitado, nenhuma operação foi aplicada',
+                    'failed_index': index,
+                    'failed_error': e.payload
+                }), e.status_code
+
+    overbooked = _overbooked_days(current_user.id, affected_days)
+    if overbooked:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Dia estourado. Libere espaço editando ou excluindo tarefas.',
+            'overbooked_days': overbooked
+        }), 400
+
+    db.session.flush()
+    results = [
+        {'index': index, 'op': kind, 'status': 'ok', **payload()}
+        for index, (kind, payload) in enumerate(applied)
+    ]
     db.session.commit()
 
-    return jsonify({'message': 'Tarefa excluída com sucesso'}), 200
+    return jsonify({'total': len(results), 'results': results}), 200
+
+
+def _apply_batch_operation(current_user, operation, tasks_by_id, affected_days):
+    """Aplica uma operação do lote na sessão. Retorna (op, função que monta o resultado)."""
+    if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+        raise TaskOperationError({'error': f'op inválida. Use: {", ".join(BATCH_OPERATIONS)}'})
+
+    kind = operation['op']
+    data = operation.get('data') or {}
+    if kind in ('create', 'update') and not isinstance(data, dict):
+        raise TaskOperationError({'error': 'data deve ser um objeto'})
+
+    try:
+        return _apply_batch_change(current_user, kind, operation, data, tasks_by_id, affected_days)
+    except (TypeError, ValueError, AttributeError) as e:
+        # Tipos inesperados no payload (ex.: duration_minutes como texto)
+        raise TaskOperationError({'error': f'Dados inválidos: {e}'})
+
+
+def _apply_batch_change(current_user, kind, operation, data, tasks_by_id, affected_days):
+    if kind == 'create':
+        task = _create_task(current_user, data, check_timebox=False)
+        if not task.delegated_to:
+            affected_days.add(task.date_scheduled)
+        return kind, lambda: {'task': task.to_dict()}
+
+    task = tasks_by_id.get(operation.get('id'))
+    if task is None:
+        raise TaskOperationError({'error': f'Tarefa {operation.get("id")} não encontrada'}, 404)
+
+    if kind == 'update':
+        _update_task(current_user, task, data)
+        if any(field in data for field in _CAPACITY_FIELDS):
+            affected_days.add(task.date_scheduled)
+        return kind, lambda: {'task': task.to_dict()}
+
+    if kind == 'delete':
+        task_id = task.id
+        _delete_task(current_user, task)
+        del tasks_by_id[task_id]
+        return kind, lambda: {'id': task_id}
+
+    try:
+        target_date = datetime.strptime(operation.get('date') or '', '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise TaskOperationError({'error': 'date inválido. Use YYYY-MM-DD'})
+    new_status = _toggle_task_date(current_user, task, target_date)
+    # A conclusão vai para o banco agora: toggles e exclusões seguintes consultam task_completions
+    db.session.flush()
+    return kind, lambda: {'task_id': task.id, 'date': target_date.isoformat(), 'task_status': new_status.value}
+
+
+def _overbooked_days(user_id, days):
+    """Dias (entre os afetados) cujas horas ocupadas passam das disponíveis após o lote"""
+    if not days:
+        return []
+
+    start, end = min(days), max(days)
+    available = get_capacity_map(user_id, start, end)
+    used = get_used_minutes_map(user_id, start, end)
+
+    overbooked = []
+    for day in sorted(days):
+        used_hours = round(used[day] / 60, 2)
+        if used_hours > available[day]:
+            overbooked.append({
+                'date': day.isoformat(),
+                'available_hours': available[day],
+                'used_hours': used_hours
+            })
+    return overbooked
 
 
 # ==================== DELEGATED TASKS ====================
@@ -568,15 +870,10 @@ def get_weekly_tasks(current_user):
             )
         ).order_by(Task.date_scheduled, Task.energy_level).all()
 
-        daily_configs = {}
-        current_date = start
-        while current_date <= end:
-            config = DailyConfig.query.filter(
-                DailyConfig.user_id == current_user.id,
-                DailyConfig.date == current_date
-            ).first()
-            daily_configs[current_date.isoformat()] = config.available_hours if config else 8.0
-            current_date += timedelta(days=1)
+        daily_configs = {
+            day.isoformat(): hours
+            for day, hours in get_capacity_map(current_user.id, start, end).items()
+        }
 
         return jsonify({
             'tasks': [task.to_dict() for task in tasks],
@@ -596,107 +893,83 @@ def get_weekly_tasks(current_user):
 @api_bp.route('/tasks/history', methods=['GET'])
 @token_required
 def get_tasks_history(current_user):
+    """
+    Histórico de concluídas, mais recentes primeiro.
+    Paginação por cursor (?cursor=<next_cursor>) ou por página (?page=N, legado).
+    """
     page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
     search_term = request.args.get('search', '').strip()
-    
-    try:
-        normal_tasks = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.status == TaskStatus.DONE,
-            Task.completed_at.isnot(None),
-            Task.is_repeatable == False
-        ).all()
+    cursor_param = request.args.get('cursor')
 
-        repeatable_tasks = Task.query.filter(
-            Task.user_id == current_user.id,
-            Task.is_repeatable == True
-        ).all()
+    try:
+        cursor = decode_cursor(cursor_param) if cursor_param else None
+    except InvalidCursor as e:
+        return jsonify({'error': str(e)}), 400
 
-        all_completed_tasks = []
-        
-        for task in normal_tasks:
-            all_completed_tasks.append({
-                'id': task.id,
-                'title': task.title,
-                'energy_level': task.energy_level.value,
-                'duration_minutes': task.duration_minutes,
-                'completed_at': task.completed_at,
-                'date_scheduled': task.date_scheduled,
-                'context_tag': task.context_tag,
-                'role_tag': task.role_tag,
-                'description': task.description
-            })
+    try:
+        if cursor:
+            items, has_next = fetch_history(current_user.id, per_page, search_term, cursor=cursor)
+        else:
+            page = max(page, 1)
+            items, has_next = fetch_history(
+                current_user.id, per_page, search_term, offset=(page - 1) * per_page
+            )
 
-        for rep_task in repeatable_tasks:
-            completions = TaskCompletion.query.filter_by(
-                task_id=rep_task.id,
-                status=TaskStatus.DONE
-            ).all()
+        next_cursor = encode_cursor(items[-1]) if has_next and items else None
 
-            seen_keys = set()
-            
-            for completion in completions:
-                key = f"{rep_task.id}_{completion.date}"
-                
-                if key in seen_keys:
-                    continue
-                    
-                seen_keys.add(key)
-                
-                all_completed_tasks.append({
-                    'id': rep_task.id,
-                    'title': rep_task.title,
-                    'energy_level': rep_task.energy_level.value,
-                    'duration_minutes': rep_task.duration_minutes,
-                    'completed_at': completion.completed_at or datetime.combine(completion.date, datetime.min.time()),
-                    'date_scheduled': completion.date,
-                    'context_tag': rep_task.context_tag,
-                    'role_tag': rep_task.role_tag,
-                    'description': rep_task.description
-                })
-
-        if search_term:
-            all_completed_tasks = [
-                t for t in all_completed_tasks 
-                if search_term.lower() in t['title'].lower()
-            ]
-
-        all_completed_tasks.sort(key=lambda t: t['completed_at'], reverse=True)
-
-        unique_tasks = []
-        seen_final = set()
-        
-        for task in all_completed_tasks:
-            key = f"{task['id']}_{task['date_scheduled']}_{task['completed_at']}"
-            if key not in seen_final:
-                unique_tasks.append(task)
-                seen_final.add(key)
-
-        total_items = len(unique_tasks)
-        start_idx = (page - 1) * per_page
-        end_idx = start_idx + per_page
-        paginated_tasks = unique_tasks[start_idx:end_idx]
-
-        for task in paginated_tasks:
+        for task in items:
             task['completed_at'] = task['completed_at'].isoformat()
             task['date_scheduled'] = task['date_scheduled'].isoformat()
 
-        total_pages = (total_items + per_page - 1) // per_page
-
-        return jsonify({
-            'tasks': paginated_tasks,
-            'pagination': {
+        if cursor:
+            pagination = {
+                'per_page': per_page,
+                'has_next': has_next,
+                'next_cursor': next_cursor
+            }
+        else:
+            total_items = count_history(current_user.id, search_term)
+            total_pages = (total_items + per_page - 1) // per_page
+            pagination = {
                 'page': page,
                 'per_page': per_page,
                 'total_items': total_items,
                 'total_pages': total_pages,
-                'has_next': page < total_pages,
-                'has_prev': page > 1
-            },
+                'has_next': has_next,
+                'has_prev': page > 1,
+                'next_cursor': next_cursor
+            }
+
+        return jsonify({
+            'tasks': items,
+            'pagination': pagination,
             'search_term': search_term if search_term else None
         }), 200
-            
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+# ==================== SEARCH ====================
+
+@api_bp.route('/tasks/search', methods=['GET'])
+@token_required
+def search_user_tasks(current_user):
+    """Busca por prefixo em título, descrição, papel e contexto, ordenada por relevância"""
+    search_term = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    if not search_term:
+        return jsonify({'error': 'Parâmetro q é obrigatório'}), 400
+
+    try:
+        tasks = search_tasks(current_user.id, search_term, limit)
+        return jsonify({
+            'query': search_term,
+            'total': len(tasks),
+            'tasks': [task.to_dict() for task in tasks]
+        }), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -708,11 +981,23 @@ def cleanup_old_tasks():
     """Remove tarefas DONE com mais de 90 dias"""
     from datetime import date
     cutoff_date = date.today() - timedelta(days=90)
-    
-    deleted = Task.query.filter(
-        Task.status == TaskStatus.DONE,
-        Task.date_scheduled < cutoff_date
-    ).delete()
-    
-    db.session.commit()
+
+    old_done = (Task.status == TaskStatus.DONE, Task.date_scheduled < cutoff_date)
+
+    with record_job_run('cleanup', cutoff_date=cutoff_date) as run:
+        started = time.perf_counter()
+        lock_wait_ms = acquire_write_lock()
+
+        subtract_tasks_from_rollup(*old_done)
+        subtract_tasks_from_capacity(*old_done)
+        deleted = Task.query.filter(*old_done).delete()
+        db.session.commit()
+
+        run.add_phase(
+            'delete_done_tasks',
+            rows=deleted,
+            duration_ms=round((time.perf_counter() - started) * 1000, 2),
+            lock_wait_ms=lock_wait_ms
+        )
+
     return jsonify({'message': f'{deleted} tarefas antigas removidas'}), 200
@@ -1,72 +1,321 @@
+"""
+Scheduler - Jobs de virada de dia
+
+Os jobs rodam em SQL de conjunto (INSERT ... SELECT / UPDATE ... WHERE),
+em faixas de user_id com no máximo SCHEDULER_CHUNK_SIZE usuários, com um
+commit por faixa: o lock de escrita do SQLite fica preso só pelo tempo de
+uma faixa, e nada é carregado na sessão além dos ids da faixa. Cada job
+imprime e retorna a contagem e a duração de cada faixa.
+
+A virada roda por fuso horário (app/rollover.py): a cada 15 minutos, os
+usuários cujos fusos passaram da meia-noite local são processados, em
+shards por deslocamento UTC, com o "hoje" local de cada shard.
+
+O backup incremental (app/backup.py) também roda aqui, a cada
+BACKUP_INTERVAL_MINUTES, e a limpeza diária do change_log (app/sync.py).
+
+Com vários workers, todos iniciam o scheduler, mas só o detentor do lease
+(app/lease.py) executa os jobs; os demais ficam de standby e assumem se o
+lease expirar.
+"""
+
+import atexit
+import time
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, date, timedelta
+from flask import current_app
+from sqlalchemy import select, insert, literal, func, and_
+from sqlalchemy.orm import aliased
+
 from app import db
-from app.models import Task, TaskStatus
+from app.models import Task, TaskStatus, User, get_brazil_time
+from app.capacity import subtract_tasks_from_capacity, add_tasks_to_capacity
+from app.lease import holder_id, acquire_lease, release_lease
+from app.rollover import due_shards, mark_rolled_over
+from app.job_runs import record_job_run, acquire_write_lock
+from app.backup import backup_database
+from app.sync import prune_change_log
+from app.write_gate import write_gate, WriteGateClosed
+
+DEFAULT_CHUNK_SIZE = 500
+SCHEDULER_LEASE = 'scheduler'
+DEFAULT_LEASE_TTL = 90  # segundos
+
+
+def _user_id_chunks(chunk_size, timezones=None):
+    """Faixas (primeiro, último) de user_id com até chunk_size usuários cada"""
+    last_id = 0
+    while True:
+        query = select(User.id).where(User.id > last_id)
+        if timezones is not None:
+            query = query.where(User.timezone.in_(timezones))
+        ids = db.session.execute(query.order_by(User.id).limit(chunk_size)).scalars().all()
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        last_id = ids[-1]
 
-def duplicate_repeatable_tasks():
-    """Duplica tarefas repetíveis para o dia seguinte"""
-    today = date.today()
+
+def _run_chunked(job_name, chunk_fn, chunk_size=None, timezones=None):
+    """
+    Executa chunk_fn(filtro de Task.user_id da faixa), com commit por
+    faixa; retorna o resumo. Com timezones, só usuários desses fusos.
+    """
+    chunk_size = chunk_size or current_app.config.get('SCHEDULER_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    chunks = []
+    job_started = time.perf_counter()
+
+    for first_id, last_id in _user_id_chunks(chunk_size, timezones):
+        user_filter = Task.user_id.between(first_id, last_id)
+        if timezones is not None:
+            # A faixa de ids pode conter usuários de outros fusos
+            user_filter = and_(user_filter, Task.user_id.in_(
+                select(User.id).where(User.timezone.in_(timezones))
+            ))
+        started = time.perf_counter()
+        try:
+            lock_wait_ms = acquire_write_lock()
+            rows = chunk_fn(user_filter)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        chunks.append({
+            'first_user_id': first_id,
+            'last_user_id': last_id,
+            'rows': rows,
+            'duration_ms': duration_ms,
+            'lock_wait_ms': lock_wait_ms
+        })
+        print(f"[SCHEDULER] {job_name}: usuários {first_id}-{last_id} -> {rows} linhas em {duration_ms}ms")
+
+    return {
+        'job': job_name,
+        'rows': sum(chunk['rows'] for chunk in chunks),
+        'duration_ms': round((time.perf_counter() - job_started) * 1000, 2),
+        'lock_wait_ms': round(sum(chunk['lock_wait_ms'] for chunk in chunks), 2),
+        'chunks': chunks
+    }
+
+
+def duplicate_repeatable_tasks(today=None, chunk_size=None, timezones=None):
+    """Duplica para hoje as tarefas repetíveis concluídas ontem (INSERT ... SELECT por faixa)"""
+    today = today or date.today()
     yesterday = today - timedelta(days=1)
 
-    repeatable_tasks = Task.query.filter(
-        Task.date_scheduled == yesterday,
-        Task.is_repeatable == True,
-        Task.status == TaskStatus.DONE
-    ).all()
-
-    for task in repeatable_tasks:
-        new_task = Task(
-            title=task.title,
-            triad_category=task.triad_category,
-            duration_minutes=task.duration_minutes,
-            date_scheduled=today,
-            role_tag=task.role_tag,
-            context_tag=task.context_tag,
-            is_repeatable=True,
-            repeat_count=task.repeat_count + 1,
-            status=TaskStatus.ACTIVE
+    def chunk(user_filter):
+        now = get_brazil_time()
+        max_id_before = db.session.query(func.max(Task.id)).scalar() or 0
+
+        # Não duplica de novo se o job rodar duas vezes no mesmo dia
+        existing = aliased(Task)
+        already_duplicated = select(existing.id).where(
+            existing.user_id == Task.user_id,
+            existing.title == Task.title,
+            existing.date_scheduled == today,
+            existing.is_repeatable == True,
+            existing.repeat_count == func.coalesce(Task.repeat_count, 0) + 1
+        ).exists()
+
+        source = select(
+            Task.user_id,
+            Task.title,
+            Task.description,
+            Task.energy_level,
+            Task.duration_minutes,
+            literal(TaskStatus.ACTIVE, Task.status.type),
+            literal(today, db.Date),
+            Task.scheduled_time,
+            Task.role_tag,
+            Task.context_tag,
+            literal(True),
+            func.coalesce(Task.repeat_count, 0) + 1,
+            Task.repeat_days,
+            literal(now, db.DateTime),
+            literal(now, db.DateTime)
+        ).where(
+            user_filter,
+            Task.date_scheduled == yesterday,
+            Task.is_repeatable == True,
+            Task.status == TaskStatus.DONE,
+            ~already_duplicated
         )
-        db.session.add(new_task)
 
-    db.session.commit()
-    print(f"[SCHEDULER] {len(repeatable_tasks)} tarefas repetíveis duplicadas para {today}")
+        result = db.session.execute(insert(Task).from_select([
+            'user_id', 'title', 'description', 'energy_level', 'duration_minutes', 'status',
+            'date_scheduled', 'scheduled_time', 'role_tag', 'context_tag', 'is_repeatable',
+            'repeat_count', 'repeat_days', 'created_at', 'updated_at'
+        ], source))
+
+        if result.rowcount:
+            add_tasks_to_capacity(Task.id > max_id_before, user_filter)
+        return result.rowcount
+
+    summary = _run_chunked('duplicate_repeatable_tasks', chunk, chunk_size, timezones)
+    print(f"[SCHEDULER] {summary['rows']} tarefas repetíveis duplicadas para {today}")
+    return summary
 
 
-def mark_pending_review():
-    """Marca tarefas ACTIVE do dia anterior como PENDING_REVIEW"""
-    yesterday = date.today() - timedelta(days=1)
+def mark_pending_review(today=None, chunk_size=None, timezones=None):
+    """Marca tarefas ACTIVE do dia anterior como PENDING_REVIEW (UPDATE por faixa)"""
+    yesterday = (today or date.today()) - timedelta(days=1)
 
-    tasks = Task.query.filter(
-        Task.date_scheduled == yesterday,
-        Task.status == TaskStatus.ACTIVE
-    ).all()
+    def chunk(user_filter):
+        pending = and_(
+            user_filter,
+            Task.date_scheduled == yesterday,
+            Task.status == TaskStatus.ACTIVE
+        )
+        task_ids = db.session.execute(select(Task.id).where(pending)).scalars().all()
+        if not task_ids:
+            return 0
 
-    for task in tasks:
-        task.status = TaskStatus.PENDING_REVIEW
+        # Repetíveis ACTIVE projetam minutos nos dias seguintes; PENDING_REVIEW não
+        subtract_tasks_from_capacity(Task.id.in_(task_ids))
+        updated = db.session.query(Task).filter(pending, Task.id.in_(task_ids)).update(
+            {Task.status: TaskStatus.PENDING_REVIEW, Task.updated_at: get_brazil_time()},
+            synchronize_session=False
+        )
+        add_tasks_to_capacity(Task.id.in_(task_ids))
+        return updated
 
-    db.session.commit()
-    print(f"[SCHEDULER] {len(tasks)} tarefas marcadas como PENDING_REVIEW de {yesterday}")
+    summary = _run_chunked('mark_pending_review', chunk, chunk_size, timezones)
+    print(f"[SCHEDULER] {summary['rows']} tarefas marcadas como PENDING_REVIEW de {yesterday}")
+    return summary
 
 
 def midnight_job():
-    """Job executado à meia-noite"""
+    """Virada de todos os usuários pela data do servidor (execução manual/debug)"""
     print(f"[SCHEDULER] Executando job de meia-noite: {datetime.now()}")
-    duplicate_repeatable_tasks()
-    mark_pending_review()
+    summaries = []
+    with record_job_run('midnight_job', today=date.today()) as run:
+        errors = []
+        for job in (duplicate_repeatable_tasks, mark_pending_review):
+            try:
+                summaries.append(job())
+                run.add_summary(summaries[-1])
+            except Exception as e:
+                errors.append(f"{job.__name__}: {e}")
+                print(f"[SCHEDULER] Erro em {job.__name__}: {e}")
+        if errors:
+            raise RuntimeError('; '.join(errors))
+    return summaries
+
+
+def rollover_job(now_utc=None):
+    """
+    Vira o dia dos fusos que já passaram da meia-noite local, um shard por
+    deslocamento UTC. Um shard só é marcado como virado se os dois jobs
+    terminarem; se falhar, é tentado de novo no próximo ciclo.
+    """
+    summaries = []
+    for offset, timezones, days in due_shards(now_utc):
+        for local_date in days:
+            print(f"[SCHEDULER] Virada UTC{offset / 60:+g} ({', '.join(timezones)}) para {local_date}")
+            try:
+                with record_job_run('rollover', utc_offset_minutes=offset,
+                                    timezones=timezones, local_date=local_date) as run:
+                    for job in (duplicate_repeatable_tasks, mark_pending_review):
+                        summaries.append(job(local_date, timezones=timezones))
+                        run.add_summary(summaries[-1])
+                    mark_rolled_over(timezones, local_date)
+                    db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"[SCHEDULER] Erro na virada UTC{offset / 60:+g} de {local_date}: {e}")
+                break
+    return summaries
 
 
 def init_scheduler(app):
-    """Inicializa o scheduler"""
+    """Inicializa o scheduler (em todos os workers; só o líder executa os jobs)"""
     scheduler = BackgroundScheduler()
+    lease_ttl = app.config.get('SCHEDULER_LEASE_TTL', DEFAULT_LEASE_TTL)
+
+    def renew_lease():
+        with app.app_context():
+            acquire_lease(SCHEDULER_LEASE, lease_ttl)
+
+    def run_rollover_job():
+        with app.app_context():
+            # Renovar aqui também fecha a corrida com um líder que acabou de morrer
+            if not acquire_lease(SCHEDULER_LEASE, lease_ttl):
+                return
+            try:
+                with write_gate.writer():
+                    rollover_job()
+            except WriteGateClosed as e:
+                print(f"[SCHEDULER] Virada adiada: {e}")
+
+    def run_backup_job():
+        with app.app_context():
+            if not acquire_lease(SCHEDULER_LEASE, lease_ttl):
+                return
+            try:
+                backup_database()
+            except Exception as e:
+                print(f"[SCHEDULER] Erro no backup automático: {e}")
+
+    def run_change_log_prune():
+        with app.app_context():
+            if not acquire_lease(SCHEDULER_LEASE, lease_ttl):
+                return
+            try:
+                with write_gate.writer():
+                    with record_job_run('change_log_prune') as run:
+                        run.add_summary(prune_change_log(
+                            app.config.get('SYNC_CHANGE_LOG_RETENTION_DAYS', 30)
+                        ))
+            except Exception as e:
+                print(f"[SCHEDULER] Erro na limpeza do change_log: {e}")
+
+    def release():
+        with app.app_context():
+            release_lease(SCHEDULER_LEASE)
 
-    # Executar à meia-noite (00:00)
+    # Heartbeat do lease a cada 1/3 do TTL
     scheduler.add_job(
-        func=lambda: app.app_context().push() or midnight_job(),
+        func=renew_lease,
+        trigger='interval',
+        seconds=max(lease_ttl // 3, 1),
+        id='scheduler_lease',
+        next_run_time=datetime.now()
+    )
+
+    # Virada por fuso: a cada 15 minutos (cobre fusos com :30 e :45)
+    scheduler.add_job(
+        func=run_rollover_job,
         trigger='cron',
-        hour=0,
-        minute=0,
-        id='midnight_job'
+        minute='0,15,30,45',
+        id='rollover_job',
+        max_instances=1,
+        coalesce=True
     )
 
+    # Limpeza diária do change_log (cursores do /sync mais antigos expiram)
+    scheduler.add_job(
+        func=run_change_log_prune,
+        trigger='cron',
+        hour=4,
+        minute=10,
+        id='change_log_prune',
+        max_instances=1,
+        coalesce=True
+    )
+
+    # Snapshot incremental automático (retenção por hora/dia/semana)
+    backup_interval = app.config.get('BACKUP_INTERVAL_MINUTES', 60)
+    if backup_interval > 0:
+        scheduler.add_job(
+            func=run_backup_job,
+            trigger='interval',
+            minutes=backup_interval,
+            id='backup_job',
+            max_instances=1,
+            coalesce=True
+        )
+
     scheduler.start()
-    print("[SCHEDULER] Scheduler inicializado - Job configurado para 00:00")
+    atexit.register(release)
+    print(f"[SCHEDULER] Scheduler inicializado ({holder_id()}) - Virada por fuso a cada 15 minutos")
@@ -0,0 +1,126 @@
+"""
+Search - Índice de busca textual (SQLite FTS5) das tarefas
+
+Mantém a tabela virtual tasks_fts (title, description, role_tag, context_tag)
+sincronizada com a tabela tasks por triggers do próprio SQLite, então
+qualquer INSERT/UPDATE/DELETE (ORM ou SQL direto) atualiza o índice.
+Se o SQLite não tiver FTS5, a busca cai para LIKE em título e descrição.
+"""
+
+import re
+from sqlalchemy import select, text, table, column, literal_column, or_
+
+from app import db
+from app.models import Task
+
+_fts_enabled = False
+
+tasks_fts = table('tasks_fts', column('rowid'), column('rank'))
+
+_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+        title, description, role_tag, context_tag,
+        content='tasks', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ai AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts(rowid, title, description, role_tag, context_tag)
+        VALUES (new.id, new.title, new.description, new.role_tag, new.context_tag);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_ad AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, role_tag, context_tag)
+        VALUES ('delete', old.id, old.title, old.description, old.role_tag, old.context_tag);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_au
+    AFTER UPDATE OF title, description, role_tag, context_tag ON tasks BEGIN
+        INSERT INTO tasks_fts(tasks_fts, rowid, title, description, role_tag, context_tag)
+        VALUES ('delete', old.id, old.title, old.description, old.role_tag, old.context_tag);
+        INSERT INTO tasks_fts(rowid, title, description, role_tag, context_tag)
+        VALUES (new.id, new.title, new.description, new.role_tag, new.context_tag);
+    END
+    """,
+]
+
+
+def init_search_index():
+    """Cria o índice FTS5 e os triggers (idempotente). Reconstrói se o índice for novo."""
+    global _fts_enabled
+
+    if db.engine.dialect.name != 'sqlite':
+        _fts_enabled = False
+        return False
+
+    try:
+        is_new = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'"
+        )).first() is None
+
+        for statement in _FTS_DDL:
+            db.session.execute(text(statement))
+
+        if is_new:
+            db.session.execute(text("INSERT INTO tasks_fts(tasks_fts) VALUES ('rebuild')"))
+
+        db.session.commit()
+        _fts_enabled = True
+    except Exception as e:
+        db.session.rollback()
+        print(f"[SEARCH] FTS5 indisponível, usando LIKE: {e}")
+        _fts_enabled = False
+
+    return _fts_enabled
+
+
+def build_match_query(search_term):
+    """Converte o texto do usuário em query FTS5 de prefixo: 'rev orç' -> '"rev"* "orç"*'"""
+    tokens = re.findall(r'\w+', search_term or '')
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _match(match_query):
+    return literal_column('tasks_fts').op('MATCH')(match_query)
+
+
+def task_match_clause(search_term):
+    """Cláusula para filtrar Task pelo texto de busca (FTS5 ou LIKE como fallback)"""
+    if _fts_enabled:
+        match_query = build_match_query(search_term)
+        if match_query is None:
+            return Task.id.is_(None)
+        return Task.id.in_(
+            select(tasks_fts.c.rowid).where(_match(match_query))
+        )
+
+    return or_(
+        Task.title.icontains(search_term, autoescape=True),
+        Task.description.icontains(search_term, autoescape=True)
+    )
+
+
+def search_tasks(user_id, search_term, limit=20):
+    """Busca tarefas do usuário ordenadas por relevância (bm25 no FTS5)"""
+    if not _fts_enabled:
+        return Task.query.filter(
+            Task.user_id == user_id,
+            task_match_clause(search_term)
+        ).order_by(Task.updated_at.desc()).limit(limit).all()
+
+    match_query = build_match_query(search_term)
+    if match_query is None:
+        return []
+
+    return Task.query.join(
+        tasks_fts, tasks_fts.c.rowid == Task.id
+    ).filter(
+        _match(match_query),
+        Task.user_id == user_id
+    ).order_by(tasks_fts.c.rank).limit(limit).all()
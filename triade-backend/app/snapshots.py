@@ -0,0 +1,303 @@
+"""
+Snapshots - Backups incrementais por blocos de páginas
+
+Cada snapshot é uma cópia consistente do banco (feita pela API de backup
+online, em memória) quebrada em blocos de BACKUP_BLOCK_PAGES páginas.
+Cada bloco é comprimido (zstd se o pacote zstandard estiver instalado,
+senão gzip) e gravado uma única vez, endereçado pelo SHA-256 do conteúdo:
+
+    backups/snapshots/blocks/<hash[:2]>/<hash>.<zst|gz>
+    backups/snapshots/manifests/<snapshot_id>.json
+
+O manifest lista, em ordem, os blocos do banco naquele momento. Blocos
+que não mudaram desde o snapshot anterior já existem e não são gravados
+de novo: o disco e a escrita crescem com o que mudou, não com o tamanho
+do banco. Restaurar = concatenar os blocos do manifest (a base + as
+mudanças acumuladas). A retenção é em camadas (últimos N, por hora, dia
+e semana) e blocos sem manifest são apagados depois. Os backups
+completos antigos (backups/triade_*.db) entram nas mesmas camadas.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional: sem ele, gzip
+    zstandard = None
+
+SNAPSHOT_DIR = Path('backups') / 'snapshots'
+LEGACY_PREFIX = 'triade_'
+DEFAULT_BLOCK_PAGES = 16
+
+# Criação, retenção e GC não podem rodar ao mesmo tempo
+snapshot_lock = threading.RLock()
+
+
+class SnapshotNotFound(FileNotFoundError):
+    pass
+
+
+def _blocks_dir():
+    return SNAPSHOT_DIR / 'blocks'
+
+
+def _manifests_dir():
+    return SNAPSHOT_DIR / 'manifests'
+
+
+def _compression():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def _compress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(data, compression):
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Snapshot comprimido com zstd, mas o pacote zstandard não está instalado')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def _block_path(block_hash, compression):
+    extension = 'zst' if compression == 'zstd' else 'gz'
+    return _blocks_dir() / block_hash[:2] / f'{block_hash}.{extension}'
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(data)
+    os.replace(tmp_path, path)
+
+
+def _iter_blocks(source, block_size):
+    """Blocos de block_size bytes de um buffer (banco serializado) ou de um arquivo"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for offset in range(0, len(view), block_size):
+            yield view[offset:offset + block_size]
+        return
+
+    with open(source, 'rb') as reader:
+        while data := reader.read(block_size):
+            yield data
+
+
+def create_snapshot(source, page_size, block_pages=DEFAULT_BLOCK_PAGES, snapshot_id=None):
+    """
+    Grava o snapshot de uma cópia consistente do banco: o conteúdo serializado
+    (bytes) ou um arquivo que não está em uso. Só os blocos novos vão para o
+    disco. Retorna o manifest, com o que foi gravado de novo (new_blocks,
+    new_bytes) para as métricas.
+    """
+    compression = _compression()
+    block_size = page_size * block_pages
+    snapshot_id = snapshot_id or datetime.utcnow().strftime('%Y%m%d_%H%M%S_%f')
+
+    blocks = []
+    new_blocks = 0
+    new_bytes = 0
+    size = 0
+    full_hash = hashlib.sha256()
+
+    with snapshot_lock:
+        for data in _iter_blocks(source, block_size):
+            size += len(data)
+            full_hash.update(data)
+            block_hash = hashlib.sha256(data).hexdigest()
+            blocks.append(block_hash)
+
+            path = _block_path(block_hash, compression)
+            if not path.exists():
+                compressed = _compress(data, compression)
+                _write_atomic(path, compressed)
+                new_blocks += 1
+                new_bytes += len(compressed)
+
+        manifest = {
+            'id': snapshot_id,
+            'created_at': datetime.utcnow().isoformat(),
+            'page_size': page_size,
+            'block_pages': block_pages,
+            'size_bytes': size,
+            'sha256': full_hash.hexdigest(),
+            'compression': compression,
+            'blocks': blocks,
+            'new_blocks': new_blocks,
+            'new_bytes': new_bytes
+        }
+        # O manifest é gravado por último: snapshot só existe com todos os blocos
+        _write_atomic(_manifests_dir() / f'{snapshot_id}.json', json.dumps(manifest).encode())
+
+    return manifest
+
+
+def load_manifest(snapshot_id):
+    path = _manifests_dir() / f'{Path(snapshot_id).name}.json'
+    if not path.exists():
+        raise SnapshotNotFound(f'Snapshot {snapshot_id} não encontrado')
+    return json.loads(path.read_bytes())
+
+
+def list_snapshots():
+    """Manifests (sem a lista de blocos), do mais recente para o mais antigo"""
+    if not _manifests_dir().exists():
+        return []
+
+    snapshots = []
+    for path in _manifests_dir().glob('*.json'):
+        manifest = json.loads(path.read_bytes())
+        manifest.pop('blocks', None)
+        snapshots.append(manifest)
+    return sorted(snapshots, key=lambda manifest: manifest['created_at'], reverse=True)
+
+
+def iter_snapshot_bytes(snapshot_id):
+    """Conteúdo do banco do snapshot, bloco a bloco (descomprimido)"""
+    manifest = load_manifest(snapshot_id)
+    for block_hash in manifest['blocks']:
+        path = _block_path(block_hash, manifest['compression'])
+        if not path.exists():
+            raise SnapshotNotFound(f'Bloco {block_hash} do snapshot {snapshot_id} não encontrado')
+        yield _decompress(path.read_bytes(), manifest['compression'])
+
+
+def iter_snapshot_range(snapshot_id, start, stop):
+    """
+    Bytes [start, stop) do banco do snapshot, descomprimindo só os blocos
+    que cobrem o intervalo (para downloads com Range)
+    """
+    manifest = load_manifest(snapshot_id)
+    block_size = manifest['page_size'] * manifest['block_pages']
+    first_block = start // block_size
+
+    for index in range(first_block, len(manifest['blocks'])):
+        block_start = index * block_size
+        if block_start >= stop:
+            break
+        path = _block_path(manifest['blocks'][index], manifest['compression'])
+        if not path.exists():
+            raise SnapshotNotFound(f"Bloco {manifest['blocks'][index]} do snapshot {snapshot_id} não encontrado")
+        data = _decompress(path.read_bytes(), manifest['compression'])
+        yield data[max(start - block_start, 0):stop - block_start]
+
+
+def materialize_snapshot(snapshot_id, target_path):
+    """Reconstrói o arquivo do banco do snapshot em target_path e confere o SHA-256"""
+    manifest = load_manifest(snapshot_id)
+    full_hash = hashlib.sha256()
+    with open(target_path, 'wb') as target:
+        for data in iter_snapshot_bytes(snapshot_id):
+            full_hash.update(data)
+            target.write(data)
+
+    if full_hash.hexdigest() != manifest['sha256']:
+        Path(target_path).unlink(missing_ok=True)
+        raise RuntimeError(f'Snapshot {snapshot_id} corrompido (checksum não confere)')
+    return manifest
+
+
+def _tier_keys(created_at):
+    """Chaves de agrupamento de cada camada de retenção"""
+    year, week, _ = created_at.isocalendar()
+    return {
+        'hourly': created_at.strftime('%Y-%m-%d %H'),
+        'daily': created_at.strftime('%Y-%m-%d'),
+        'weekly': f'{year}-W{week:02d}'
+    }
+
+
+def select_retained(snapshots, keep_last, keep_hourly, keep_daily, keep_weekly):
+    """
+    ids dos snapshots mantidos: os keep_last mais recentes (no mínimo 1) e o
+    mais recente de cada uma das últimas keep_hourly horas, keep_daily dias
+    e keep_weekly semanas (com snapshot).
+    """
+    ordered = sorted(snapshots, key=lambda manifest: manifest['created_at'], reverse=True)
+    retained = {manifest['id'] for manifest in ordered[:max(keep_last, 1)]}
+
+    for tier, keep in (('hourly', keep_hourly), ('daily', keep_daily), ('weekly', keep_weekly)):
+        seen = set()
+        for manifest in ordered:
+            key = _tier_keys(datetime.fromisoformat(manifest['created_at']))[tier]
+            if key in seen:
+                continue
+            if len(seen) >= keep:
+                break
+            seen.add(key)
+            retained.add(manifest['id'])
+    return retained
+
+
+def _legacy_backups():
+    """Backups completos antigos (backups/triade_*.db) no formato dos manifests, para a retenção"""
+    return [
+        {'id': path.name, 'path': path, 'created_at': datetime.fromtimestamp(path.stat().st_mtime).isoformat()}
+        for path in SNAPSHOT_DIR.parent.glob(f'{LEGACY_PREFIX}*.db')
+    ]
+
+
+def apply_retention(keep_last, keep_hourly, keep_daily, keep_weekly):
+    """
+    Apaga snapshots e backups completos antigos fora das camadas e os blocos
+    que ficaram sem referência
+    """
+    with snapshot_lock:
+        snapshots = list_snapshots()
+        legacy = _legacy_backups()
+        retained = select_retained(snapshots + legacy, keep_last, keep_hourly, keep_daily, keep_weekly)
+
+        removed = 0
+        for manifest in snapshots:
+            if manifest['id'] not in retained:
+                (_manifests_dir() / f"{manifest['id']}.json").unlink(missing_ok=True)
+                removed += 1
+
+        removed_legacy = 0
+        for backup in legacy:
+            if backup['id'] not in retained:
+                backup['path'].unlink(missing_ok=True)
+                removed_legacy += 1
+
+        referenced = set()
+        for manifest in snapshots:
+            if manifest['id'] in retained:
+                referenced.update(load_manifest(manifest['id'])['blocks'])
+
+        freed_blocks = 0
+        freed_bytes = 0
+        if _blocks_dir().exists():
+            for path in _blocks_dir().glob('*/*.*'):
+                if path.name.startswith('.tmp-'):
+                    continue
+                if path.name.split('.')[0] not in referenced:
+                    freed_bytes += path.stat().st_size
+                    path.unlink()
+                    freed_blocks += 1
+
+    return {
+        'removed_snapshots': removed,
+        'removed_legacy_backups': removed_legacy,
+        'freed_blocks': freed_blocks,
+        'freed_bytes': freed_bytes
+    }
+
+
+def storage_usage():
+    """Bytes em disco dos blocos e total lógico dos snapshots (para ver a deduplicação)"""
+    stored = sum(path.stat().st_size for path in _blocks_dir().glob('*/*.*')) if _blocks_dir().exists() else 0
+    logical = sum(manifest['size_bytes'] for manifest in list_snapshots())
+    return {'stored_bytes': stored, 'logical_bytes': logical}
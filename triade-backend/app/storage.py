@@ -0,0 +1,87 @@
+"""
+Storage - Perfil do SQLite aplicado em cada conexão
+
+SQLITE_PROFILE escolhe o perfil:
+
+- production: WAL (leitores não bloqueiam o escritor e vice-versa),
+  synchronous=NORMAL (seguro em WAL; só o último commit pode se perder
+  numa queda de energia), busy_timeout (espera o lock em vez de falhar
+  com "database is locked"), cache de páginas maior, mmap e tabelas
+  temporárias em memória
+- default: configuração padrão do SQLite (journal de rollback)
+
+Os valores vêm da config (SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB,
+SQLITE_MMAP_SIZE_MB). O tamanho do pool fica em SQLALCHEMY_ENGINE_OPTIONS.
+"""
+
+from sqlalchemy import event
+
+from app import db
+
+SQLITE_PROFILES = ('production', 'default')
+
+
+def profile_pragmas(config):
+    """PRAGMAs do perfil configurado, na ordem em que são aplicados"""
+    profile = config.get('SQLITE_PROFILE', 'production')
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"SQLITE_PROFILE deve ser um de: {', '.join(SQLITE_PROFILES)}")
+
+    if profile == 'default':
+        # journal_mode fica gravado no arquivo: volta explicitamente do WAL
+        return [('journal_mode', 'DELETE')]
+
+    return [
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('busy_timeout', config.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        ('cache_size', -config.get('SQLITE_CACHE_SIZE_KB', 20000)),  # negativo = KiB
+        ('mmap_size', config.get('SQLITE_MMAP_SIZE_MB', 256) * 1024 * 1024),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def read_pragmas(config):
+    """PRAGMAs das conexões somente leitura (app/db_routing.py): sem journal_mode (grava no arquivo)"""
+    pragmas = [
+        (name, value) for name, value in profile_pragmas(config)
+        if name != 'journal_mode'
+    ]
+    return pragmas + [('query_only', 'ON')]
+
+
+def configure_sqlite(app):
+    """Registra os PRAGMAs do perfil em cada nova conexão do engine (chamar no app context)"""
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = profile_pragmas(app.config)
+
+    @event.listens_for(engine, 'connect')
+    def apply_profile(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    print(f"[STORAGE] SQLite com perfil {app.config.get('SQLITE_PROFILE', 'production')}")
+
+
+def current_pragmas():
+    """
+    Valores em vigor numa conexão (para /health e o benchmark). Usa o pool
+    somente leitura quando existe, para não ocupar uma conexão de escrita.
+    """
+    from flask import current_app
+    from app.db_routing import EXTENSION_KEY
+
+    names = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store')
+    engine = current_app.extensions.get(EXTENSION_KEY) or db.engine
+    with engine.connect() as connection:
+        return {
+            name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in names
+        }
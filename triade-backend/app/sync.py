@@ -0,0 +1,189 @@
+"""
+Sync - Log de alterações para sincronização incremental
+
+Triggers do SQLite gravam em change_log cada INSERT/UPDATE/DELETE em tasks,
+task_completions e daily_configs (inclusive deletes em lote e o job de
+meia-noite). O id do log (AUTOINCREMENT) é o cursor: como o SQLite tem um
+único escritor, os ids ficam visíveis sempre em ordem crescente.
+
+Um job diário apaga as entradas com mais de SYNC_CHANGE_LOG_RETENTION_DAYS
+dias. Quem pedir um cursor anterior ao horizonte (último id apagado)
+recebe 410 e precisa refazer a réplica completa (since=0).
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, func
+
+from app import db
+from app.models import Task, TaskCompletion, DailyConfig, ChangeLog
+from app.job_runs import acquire_write_lock
+
+DEFAULT_RETENTION_DAYS = 30
+PRUNE_CHUNK_SIZE = 5000
+
+
+class SyncCursorExpired(Exception):
+    """O cursor é anterior ao horizonte do change_log (entradas já apagadas)"""
+
+    def __init__(self, horizon):
+        super().__init__('Cursor expirado: refaça a sincronização completa com since=0')
+        self.horizon = horizon
+
+# entidade do log -> (tabela, modelo)
+SYNC_ENTITIES = {
+    'task': ('tasks', Task),
+    'task_completion': ('task_completions', TaskCompletion),
+    'daily_config': ('daily_configs', DailyConfig),
+}
+
+_TRIGGER_TEMPLATE = """
+    CREATE TRIGGER IF NOT EXISTS change_log_{table}_{suffix} AFTER {event} ON {table} BEGIN
+        INSERT INTO change_log(user_id, entity, entity_id, action, changed_at)
+        VALUES ({row}.user_id, '{entity}', {row}.id, '{action}', strftime('%Y-%m-%d %H:%M:%f', 'now'));
+    END
+"""
+
+
+def init_change_log():
+    """Cria os triggers que alimentam o change_log (idempotente)"""
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    for entity, (table, _) in SYNC_ENTITIES.items():
+        for suffix, event, row, action in (
+            ('ai', 'INSERT', 'new', 'upsert'),
+            ('au', 'UPDATE', 'new', 'upsert'),
+            ('ad', 'DELETE', 'old', 'delete'),
+        ):
+            db.session.execute(text(_TRIGGER_TEMPLATE.format(
+                table=table, suffix=suffix, event=event, row=row, entity=entity, action=action
+            )))
+
+    db.session.commit()
+    return True
+
+
+def current_cursor():
+    """Maior id do log (cursor de uma réplica completa feita agora)"""
+    return db.session.query(func.max(ChangeLog.id)).scalar() or 0
+
+
+def change_log_horizon():
+    """Maior id já apagado do log (0 se nada foi apagado); cursores abaixo dele expiraram"""
+    return db.session.execute(text("""
+        SELECT COALESCE(
+            (SELECT MIN(id) - 1 FROM change_log),
+            (SELECT seq FROM sqlite_sequence WHERE name = 'change_log'),
+            0
+        )
+    """)).scalar()
+
+
+def prune_change_log(retention_days=DEFAULT_RETENTION_DAYS, chunk_size=PRUNE_CHUNK_SIZE):
+    """
+    Apaga as entradas com mais de retention_days dias, em faixas de ids com
+    commit por faixa (os ids crescem com changed_at). Retorna o resumo no
+    formato dos jobs do scheduler.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    chunks = []
+    job_started = time.perf_counter()
+
+    while True:
+        last_id = db.session.query(func.max(ChangeLog.id)).filter(
+            ChangeLog.id.in_(
+                db.session.query(ChangeLog.id)
+                .filter(ChangeLog.changed_at < cutoff)
+                .order_by(ChangeLog.id)
+                .limit(chunk_size)
+            )
+        ).scalar()
+        if last_id is None:
+            break
+
+        started = time.perf_counter()
+        try:
+            lock_wait_ms = acquire_write_lock()
+            rows = ChangeLog.query.filter(ChangeLog.id <= last_id).delete(synchronize_session=False)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        chunks.append({
+            'last_id': last_id,
+            'rows': rows,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 2),
+            'lock_wait_ms': lock_wait_ms
+        })
+
+    return {
+        'job': 'change_log_prune',
+        'rows': sum(chunk['rows'] for chunk in chunks),
+        'duration_ms': round((time.perf_counter() - job_started) * 1000, 2),
+        'lock_wait_ms': round(sum(chunk['lock_wait_ms'] for chunk in chunks), 2),
+        'chunks': chunks
+    }
+
+
+def snapshot(user_id):
+    """Estado completo do usuário (bootstrap de uma réplica local)"""
+    cursor = current_cursor()
+    return {
+        'cursor': cursor,
+        'has_more': False,
+        'full': True,
+        'tasks': [t.to_dict() for t in Task.query.filter(Task.user_id == user_id).all()],
+        'task_completions': [
+            c.to_dict() for c in TaskCompletion.query.filter(TaskCompletion.user_id == user_id).all()
+        ],
+        'daily_configs': [
+            c.to_dict() for c in DailyConfig.query.filter(DailyConfig.user_id == user_id).all()
+        ],
+        'deleted': {'tasks': [], 'task_completions': [], 'daily_configs': []}
+    }
+
+
+def changes_since(user_id, since, limit=1000):
+    """
+    Entidades alteradas/excluídas depois do cursor `since`.
+    Várias alterações da mesma entidade viram uma só (vale a última ação).
+    Levanta SyncCursorExpired se parte do intervalo já foi apagada.
+    """
+    entries = ChangeLog.query.filter(
+        ChangeLog.user_id == user_id,
+        ChangeLog.id > since
+    ).order_by(ChangeLog.id).limit(limit).all()
+
+    # Conferido depois da leitura: uma limpeza no meio não passa despercebida
+    horizon = change_log_horizon()
+    if since < horizon:
+        raise SyncCursorExpired(horizon)
+
+    latest = {}
+    for entry in entries:
+        latest[(entry.entity, entry.entity_id)] = entry.action
+
+    result = {
+        'cursor': entries[-1].id if entries else since,
+        'has_more': len(entries) == limit,
+        'full': False,
+        'deleted': {}
+    }
+
+    for entity, (table, model) in SYNC_ENTITIES.items():
+        upserted = [entity_id for (name, entity_id), action in latest.items()
+                    if name == entity and action == 'upsert']
+        deleted = [entity_id for (name, entity_id), action in latest.items()
+                   if name == entity and action == 'delete']
+
+        rows = model.query.filter(model.id.in_(upserted)).all() if upserted else []
+        # Linhas que sumiram depois do upsert (ex.: excluídas em outra página do log)
+        found = {row.id for row in rows}
+        deleted += [entity_id for entity_id in upserted if entity_id not in found]
+
+        result[table] = [row.to_dict() for row in rows]
+        result['deleted'][table] = sorted(deleted)
+
+    return result
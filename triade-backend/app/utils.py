@@ -1,28 +1,12 @@
-from datetime import datetime, date
-from app import db
-from app.models import Task, DailyConfig, TaskStatus
+from app.capacity import get_capacity_map, get_used_minutes
 
 def calculate_used_hours(target_date, user_id=None):
-    """Calcula horas ocupadas em um dia específico"""
-    query = Task.query.filter(
-        Task.date_scheduled == target_date,
-        Task.status == TaskStatus.ACTIVE
-    )
-    if user_id:
-        query = query.filter(Task.user_id == user_id)
-    
-    tasks = query.all()
-    total_minutes = sum(task.duration_minutes for task in tasks)
-    return round(total_minutes / 60, 2)
+    """Calcula horas ocupadas em um dia específico (ledger: reais + repetíveis projetadas, sem delegadas)"""
+    return round(get_used_minutes(user_id, target_date) / 60, 2)
 
 def get_available_hours(target_date, user_id=None):
     """Retorna horas disponíveis do dia (padrão 8h se não configurado)"""
-    query = DailyConfig.query.filter(DailyConfig.date == target_date)
-    if user_id:
-        query = query.filter(DailyConfig.user_id == user_id)
-    
-    config = query.first()
-    return config.available_hours if config else 8.0
+    return get_capacity_map(user_id, target_date)[target_date]
 
 def validate_timebox(target_date, new_duration_minutes, user_id=None):
     """Valida se adicionar nova tarefa estoura o dia"""
@@ -0,0 +1,112 @@
+"""
+Write Gate - Pausa das escritas deste processo
+
+Requests de escrita (POST/PUT/PATCH/DELETE) e os jobs do scheduler passam
+pelo gate. Operações que trocam o banco inteiro (restore a quente) fecham
+o gate: novas escritas esperam até WRITE_GATE_WAIT_SECONDS (e recebem 503
+se ele não reabrir), e as que já estão em andamento terminam antes de a
+operação começar.
+
+O gate é por processo. Escritas de outros workers são seguradas pelo
+próprio lock do SQLite enquanto o banco é sobrescrito.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import request, jsonify
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+DEFAULT_WAIT_SECONDS = 30
+
+
+class WriteGateClosed(Exception):
+    """O gate não reabriu dentro do tempo de espera"""
+
+
+class WriteGate:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._paused = False
+        self._local = threading.local()
+
+    @property
+    def paused(self):
+        return self._paused
+
+    def enter(self, timeout=DEFAULT_WAIT_SECONDS):
+        """Registra uma escrita em andamento (espera o gate reabrir)"""
+        if getattr(self._local, 'depth', 0):
+            self._local.depth += 1
+            return
+        with self._condition:
+            if not self._condition.wait_for(lambda: not self._paused, timeout):
+                raise WriteGateClosed('Escritas pausadas para manutenção do banco')
+            self._active += 1
+        self._local.depth = 1
+
+    def leave(self):
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            return
+        self._local.depth = depth - 1
+        if depth == 1:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def writer(self, timeout=DEFAULT_WAIT_SECONDS):
+        self.enter(timeout)
+        try:
+            yield
+        finally:
+            self.leave()
+
+    @contextmanager
+    def pause(self, drain_timeout=DEFAULT_WAIT_SECONDS):
+        """
+        Fecha o gate e espera as escritas em andamento terminarem (exceto a
+        da própria thread, se ela estiver dentro do gate). Retorna, no
+        yield, quanto tempo levou para drenar (ms).
+        """
+        own = 1 if getattr(self._local, 'depth', 0) else 0
+        started = time.perf_counter()
+        with self._condition:
+            if self._paused:
+                raise WriteGateClosed('Já existe uma operação com as escritas pausadas')
+            self._paused = True
+            drained = self._condition.wait_for(lambda: self._active <= own, drain_timeout)
+        try:
+            if not drained:
+                raise WriteGateClosed('Escritas em andamento não terminaram a tempo')
+            yield round((time.perf_counter() - started) * 1000, 2)
+        finally:
+            with self._condition:
+                self._paused = False
+                self._condition.notify_all()
+
+
+write_gate = WriteGate()
+
+
+def init_write_gate(app):
+    """Faz os requests de escrita passarem pelo gate"""
+    timeout = app.config.get('WRITE_GATE_WAIT_SECONDS', DEFAULT_WAIT_SECONDS)
+
+    @app.before_request
+    def enter_write_gate():
+        if request.method not in WRITE_METHODS:
+            return None
+        try:
+            write_gate.enter(timeout)
+        except WriteGateClosed as e:
+            return jsonify({'error': str(e)}), 503
+        return None
+
+    @app.teardown_request
+    def leave_write_gate(exc=None):
+        if request.method in WRITE_METHODS:
+            write_gate.leave()
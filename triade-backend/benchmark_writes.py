@@ -0,0 +1,206 @@
+"""
+Benchmark de escritas concorrentes no SQLite (toggle-date)
+
+Simula vários workers (processos) com várias threads cada, todos marcando
+e desmarcando tarefas via POST /tasks/<id>/toggle-date, e compara os
+perfis de SQLite (SQLITE_PROFILE, ver app/storage.py): escritas por
+segundo, erros ("database is locked") e latência. Threads leitoras
+(GET /tasks/daily) medem a latência de leitura durante a rajada de
+escritas, com ou sem o pool somente leitura (app/db_routing.py).
+
+Cada perfil roda em um banco temporário próprio; o banco do instance/
+não é tocado.
+
+Uso:
+    python benchmark_writes.py
+    python benchmark_writes.py --processes 4 --threads 8 --seconds 15
+    python benchmark_writes.py --profiles production
+    python benchmark_writes.py --no-read-split   # leituras no engine principal
+    python benchmark_writes.py --group-commit    # toggle-date em lotes (app/group_commit.py)
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+BENCHMARK_DATE = date.today().isoformat()
+
+
+def _create_app(db_path, profile, read_split=True, group_commit=False):
+    # Sem telemetria do Sentry durante o benchmark (cada request viraria um trace)
+    import sentry_sdk
+    sentry_sdk.init = lambda *args, **kwargs: None
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from app import create_app
+    from config import Config
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{db_path}'
+        SQLITE_PROFILE = profile
+        SQLITE_READ_POOL_SIZE = Config.SQLITE_READ_POOL_SIZE if read_split else 0
+        GROUP_COMMIT_ENABLED = group_commit
+
+    return create_app(BenchmarkConfig)
+
+
+def _seed(db_path, profile, read_split, users):
+    """Cria um usuário com uma tarefa repetível por thread. Retorna [(token, task_id)]"""
+    app = _create_app(db_path, profile, read_split)
+    client = app.test_client()
+    seeds = []
+    for index in range(users):
+        response = client.post('/auth/register', json={
+            'username': f'bench{index}',
+            'personal_name': f'Bench {index}',
+            'email': f'bench{index}@example.com',
+            'password': 'Bench@123'
+        })
+        token = response.get_json()['access_token']
+        response = client.post('/tasks', headers={'Authorization': f'Bearer {token}'}, json={
+            'title': 'Tarefa do benchmark',
+            'energy_level': 'LOW_ENERGY',
+            'duration_minutes': 5,
+            'date_scheduled': BENCHMARK_DATE,
+            'is_repeatable': True
+        })
+        seeds.append((token, response.get_json()['id']))
+    return seeds
+
+
+def _worker(db_path, profile, read_split, group_commit, seeds, readers, seconds, start_at, results):
+    """Um "worker" (processo) com uma thread escritora por (token, task_id) e `readers` leitoras"""
+    import threading
+
+    app = _create_app(db_path, profile, read_split, group_commit)
+    latencies = []
+    read_latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def run(token, task_id, reader=False):
+        client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        local_latencies = []
+        local_errors = []
+        while time.time() < start_at:
+            time.sleep(0.001)
+        deadline = start_at + seconds
+        while time.time() < deadline:
+            started = time.perf_counter()
+            try:
+                if reader:
+                    response = client.get(f'/tasks/daily?date={BENCHMARK_DATE}', headers=headers)
+                else:
+                    response = client.post(f'/tasks/{task_id}/toggle-date', headers=headers, json={'date': BENCHMARK_DATE})
+                ok = response.status_code == 200
+                error = None if ok else (response.get_json() or {}).get('error', str(response.status_code))
+            except Exception as e:
+                ok, error = False, str(e)
+            if ok:
+                local_latencies.append((time.perf_counter() - started) * 1000)
+            else:
+                local_errors.append(error)
+        with lock:
+            (read_latencies if reader else latencies).extend(local_latencies)
+            errors.extend(local_errors)
+
+    threads = [threading.Thread(target=run, args=seed) for seed in seeds]
+    threads += [threading.Thread(target=run, args=(*seeds[0], True)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.put((latencies, read_latencies, errors))
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run_profile(profile, processes, threads, readers, seconds, read_split=True, group_commit=False):
+    with tempfile.TemporaryDirectory(prefix=f'triade_bench_{profile}_') as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        seeds = _seed(db_path, profile, read_split, processes * threads)
+
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        start_at = time.time() + 5  # tempo para todos os processos subirem o app
+        workers = [
+            context.Process(target=_worker, args=(
+                db_path, profile, read_split, group_commit, seeds[index * threads:(index + 1) * threads],
+                readers, seconds, start_at, results
+            ))
+            for index in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+
+        latencies, read_latencies, errors = [], [], []
+        for _ in workers:
+            worker_latencies, worker_read_latencies, worker_errors = results.get()
+            latencies.extend(worker_latencies)
+            read_latencies.extend(worker_read_latencies)
+            errors.extend(worker_errors)
+        for worker in workers:
+            worker.join()
+
+    return {
+        'profile': profile,
+        'writes': len(latencies),
+        'writes_per_second': round(len(latencies) / seconds, 1),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:3],
+        'p50_ms': round(_percentile(latencies, 0.50), 1),
+        'p95_ms': round(_percentile(latencies, 0.95), 1),
+        'p99_ms': round(_percentile(latencies, 0.99), 1),
+        'reads_per_second': round(len(read_latencies) / seconds, 1),
+        'read_p50_ms': round(_percentile(read_latencies, 0.50), 1),
+        'read_p95_ms': round(_percentile(read_latencies, 0.95), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de escritas concorrentes (toggle-date)')
+    parser.add_argument('--processes', type=int, default=4, help='workers (processos)')
+    parser.add_argument('--threads', type=int, default=4, help='threads por worker')
+    parser.add_argument('--readers', type=int, default=2, help='threads leitoras (GET /tasks/daily) por worker')
+    parser.add_argument('--seconds', type=int, default=10, help='duração de cada rodada')
+    parser.add_argument('--profiles', default='default,production', help='perfis a comparar (SQLITE_PROFILE)')
+    parser.add_argument('--no-read-split', action='store_true', help='leituras no engine principal (SQLITE_READ_POOL_SIZE=0)')
+    parser.add_argument('--group-commit', action='store_true', help='toggle-date pelo group commit (GROUP_COMMIT_ENABLED)')
+    args = parser.parse_args()
+
+    print(f"🏁 {args.processes} processos x ({args.threads} escritoras + {args.readers} leitoras), "
+          f"{args.seconds}s por perfil, pool de leitura {'desligado' if args.no_read_split else 'ligado'}, "
+          f"group commit {'ligado' if args.group_commit else 'desligado'}")
+    print()
+
+    summaries = []
+    for profile in args.profiles.split(','):
+        print(f"⏱️  Rodando perfil {profile}...")
+        summaries.append(run_profile(
+            profile.strip(), args.processes, args.threads, args.readers, args.seconds,
+            not args.no_read_split, args.group_commit
+        ))
+
+    print()
+    print(f"{'perfil':<12}{'escritas/s':>12}{'erros':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'leituras/s':>12}{'leit. p50':>11}{'leit. p95':>11}")
+    for summary in summaries:
+        print(f"{summary['profile']:<12}{summary['writes_per_second']:>12}{summary['errors']:>8}"
+              f"{summary['p50_ms']:>10}{summary['p95_ms']:>10}{summary['p99_ms']:>10}"
+              f"{summary['reads_per_second']:>12}{summary['read_p50_ms']:>11}{summary['read_p95_ms']:>11}")
+        for sample in summary['error_samples']:
+            print(f"    ↳ {sample}")
+
+
+if __name__ == '__main__':
+    main()
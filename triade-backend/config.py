@@ -8,6 +8,26 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-prod'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///triade.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Perfil do SQLite (app/storage.py): 'production' (WAL, synchronous=NORMAL,
+    # busy_timeout, cache, mmap) ou 'default' (journal de rollback)
+    SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 20000))  # por conexão
+    SQLITE_MMAP_SIZE_MB = int(os.environ.get('SQLITE_MMAP_SIZE_MB', 256))
+    # Pool somente leitura para requests GET (app/db_routing.py); 0 desliga a
+    # separação. Com ela ligada, o engine principal (escritas) usa o pool de escrita.
+    SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 10))
+    SQLITE_READ_POOL_MAX_OVERFLOW = int(os.environ.get('SQLITE_READ_POOL_MAX_OVERFLOW', 10))
+    # O SQLite tem um escritor por vez: mais conexões só esperam o busy_timeout
+    SQLITE_WRITE_POOL_SIZE = int(os.environ.get('SQLITE_WRITE_POOL_SIZE', 4))
+    SQLITE_WRITE_POOL_MAX_OVERFLOW = int(os.environ.get('SQLITE_WRITE_POOL_MAX_OVERFLOW', 4))
+    # Pool de conexões do engine principal (uma conexão por thread em uso)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),  # segundos esperando conexão livre
+    }
     JSON_SORT_KEYS = False
     
     # JWT Configuration
@@ -15,5 +35,46 @@ class Config:
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=30)  # Token válido por 30 dias
     JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=90)  # Refresh token válido por 90 dias
     
+    # Cache do usuário autenticado (por processo; 0 desativa)
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 1024))
+    PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', 300))  # segundos
+    
+    # Rotas /admin (header X-Admin-Token); sem valor, ficam desabilitadas
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+    
+    # Jobs de meia-noite: usuários por transação
+    SCHEDULER_CHUNK_SIZE = int(os.environ.get('SCHEDULER_CHUNK_SIZE', 500))
+    # Lease do líder entre workers (renovado a cada TTL/3)
+    SCHEDULER_LEASE_TTL = int(os.environ.get('SCHEDULER_LEASE_TTL', 90))  # segundos
+    JOB_RUNS_RETENTION_DAYS = int(os.environ.get('JOB_RUNS_RETENTION_DAYS', 90))
+    # Entradas do change_log (/sync) mais antigas são apagadas por um job diário
+    SYNC_CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('SYNC_CHANGE_LOG_RETENTION_DAYS', 30))
+    
+    # Group commit de toggle-date/skip (app/group_commit.py): toques de vários
+    # requests confirmados em uma transação a cada GROUP_COMMIT_WINDOW_MS
+    GROUP_COMMIT_ENABLED = os.environ.get('GROUP_COMMIT_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    GROUP_COMMIT_WINDOW_MS = int(os.environ.get('GROUP_COMMIT_WINDOW_MS', 5))
+    GROUP_COMMIT_MAX_BATCH = int(os.environ.get('GROUP_COMMIT_MAX_BATCH', 64))
+    
+    # Restore a quente: espera máxima de uma escrita pelo gate e da drenagem
+    WRITE_GATE_WAIT_SECONDS = int(os.environ.get('WRITE_GATE_WAIT_SECONDS', 30))
+    
+    # Backup online (API de backup do SQLite, em passos)
+    BACKUP_PAGES_PER_STEP = int(os.environ.get('BACKUP_PAGES_PER_STEP', 256))
+    BACKUP_STEP_SLEEP_MS = int(os.environ.get('BACKUP_STEP_SLEEP_MS', 5))  # pausa entre passos
+    BACKUP_MAX_RESTARTS = int(os.environ.get('BACKUP_MAX_RESTARTS', 5))  # depois, cópia em um passo
+    # Bancos até esse tamanho são copiados em memória (acima, via arquivo temporário)
+    BACKUP_IN_MEMORY_MAX_MB = int(os.environ.get('BACKUP_IN_MEMORY_MAX_MB', 512))
+    # Snapshots incrementais: páginas por bloco, retenção em camadas e intervalo automático
+    BACKUP_BLOCK_PAGES = int(os.environ.get('BACKUP_BLOCK_PAGES', 16))
+    BACKUP_KEEP_LAST = int(os.environ.get('BACKUP_KEEP_LAST', 3))
+    BACKUP_KEEP_HOURLY = int(os.environ.get('BACKUP_KEEP_HOURLY', 24))
+    BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 7))
+    BACKUP_KEEP_WEEKLY = int(os.environ.get('BACKUP_KEEP_WEEKLY', 4))
+    BACKUP_INTERVAL_MINUTES = int(os.environ.get('BACKUP_INTERVAL_MINUTES', 60))  # 0 desativa
+    # Tamanho máximo de um banco enviado por PUT /backup/<name>/upload
+    BACKUP_MAX_UPLOAD_MB = int(os.environ.get('BACKUP_MAX_UPLOAD_MB', 2048))
+    
     # Upload Configuration
     MAX_CONTENT_LENGTH = 2 * 1024 * 1024  # 2MB max para upload de foto
+    AVATAR_STORAGE_DIR = os.environ.get('AVATAR_STORAGE_DIR')  # Padrão: instance/avatars